@@ -0,0 +1,122 @@
+"""
+Copyright (C) Gonzalo Casas 2020
+Distributed under the MIT License (license terms are at http://opensource.org/licenses/MIT).
+"""
+
+#
+# Sensor acquisition decoupled from the radio loop.
+#
+# Every Source is sampled on its own period by its own background thread into a fixed-size
+# RingBuffer. The radio loop takes the samples collected since the last uplink with
+# Acquisition.collect() and gets them aggregated (min/mean/max over the window), so
+# neither slow sensor reads nor slow serial exchanges delay each other or other sensors,
+# and samples taken faster than the uplink rate are summarized instead of dropped. When a
+# ring is full the oldest sample is overwritten and counted in overflows.
+#
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+import random
+import threading
+import time
+from array import array
+
+
+class RingBuffer:
+    def __init__(self, size:int):
+        self.buf = array('d', [0.0]) * size
+        self.head = 0       # next write position
+        self.count = 0      # number of valid samples
+        self.overflows = 0  # samples overwritten before being collected, in total
+        self._drained = 0   # overflows at last drain
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def push(self, value:float):
+        with self.lock:
+            self.buf[self.head] = value
+            self.head = (self.head + 1) % len(self.buf)
+            if self.count == len(self.buf):
+                self.overflows += 1
+            else:
+                self.count += 1
+
+    # remove and return all samples, oldest first, and the overflows since the last drain
+    def drain(self) -> Tuple[List[float], int]:
+        with self.lock:
+            overflows = self.overflows - self._drained
+            self._drained = self.overflows
+            size = len(self.buf)
+            start = (self.head - self.count) % size
+            if start + self.count <= size:
+                vals = self.buf[start:start+self.count].tolist()
+            else:
+                vals = self.buf[start:].tolist() + self.buf[:self.head].tolist()
+            self.count = 0
+            return (vals, overflows)
+
+
+class Source:
+    def __init__(self, name:str, read:Callable[[], float], period:float=1.0, size:int=256):
+        """
+        Sensor sampled every period seconds by calling read(), keeping up to size samples.
+        """
+        self.name = name
+        self.read = read
+        self.period = period
+        self.ring = RingBuffer(size)
+        self.errors = 0
+        self.next = 0.0     # monotonic time of next sample
+
+    # sample until stop is set, a read overrunning the period delays only this source
+    def run(self, stop:threading.Event):
+        self.next = time.monotonic()
+        while not stop.is_set():
+            try:
+                self.ring.push(self.read())
+            except Exception as ex:
+                self.errors += 1
+                print(f"Sensor {self.name} failed: {ex}")
+            now = time.monotonic()
+            self.next = max(self.next + self.period, now)
+            stop.wait(self.next - now)
+
+
+class Acquisition:
+    def __init__(self, sources:List[Source]):
+        self.sources = sources
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=src.run, args=(self._stop,), daemon=True) for src in self.sources]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    # aggregate samples collected since last call: name -> { 'n', 'min', 'mean', 'max', 'overflows' } (None if no samples)
+    def collect(self) -> Dict[str, Optional[Dict]]:
+        result = {}
+        for src in self.sources:
+            (vals, overflows) = src.ring.drain()
+            result[src.name] = { 'n': len(vals), 'min': min(vals), 'mean': sum(vals) / len(vals), 'max': max(vals),
+                                 'overflows': overflows } if vals else None
+        return result
+
+    # samples overwritten before being collected, in total
+    @property
+    def overflows(self) -> Dict[str, int]:
+        return { src.name: src.ring.overflows for src in self.sources }
+
+
+def simulated_temperature() -> float:
+    # Simulates a temperature sensor (for instance)
+    return round(random.uniform(17.0, 24.0), 1)
@@ -0,0 +1,148 @@
+"""
+Copyright (C) Gonzalo Casas 2020
+Distributed under the MIT License (license terms are at http://opensource.org/licenses/MIT).
+"""
+
+#
+# Adaptive selection of ADR profile and TX power offset from link-quality feedback.
+#
+# The controller is fed every event of a modem via event(). It keeps a rolling window of
+# the RSSI/SNR reported with downlinks and of the TXDONE outcomes, and moves along a ladder
+# of settings ordered from most robust (long-range profile, full power) to most efficient
+# (low-power profile, reduced power):
+#
+#  - delivery ratio below target -> one step towards robust
+#  - delivery ratio at target (and SNR/RSSI with margin, if downlinks were received)
+#    -> one step towards efficient
+#
+# A step left for low delivery is held off for a number of uplinks before it is probed
+# again; the hold-off doubles with each repeated failure (up to a limit) and is reset once
+# the step delivers at target over a full window.
+#
+# Delivery is only measurable with confirmed uplinks (TXDONE 'frame sent and confirmed').
+# The controller starts from the modem's current setting. After each change the outcome
+# window is cleared so the next decision is based on the new setting only; the signal window
+# is kept, as it describes the downlink path. Every decision, including failed attempts to
+# apply one, is logged; in dry-run mode no commands are sent to the modem.
+#
+
+from typing import Optional, Tuple
+
+import time
+from collections import deque
+from struct import unpack_from
+
+import modemdefs as ModemDefs
+from modem import Modem, Event
+
+
+class LinkController:
+    def __init__(self, modem:Modem, target:float=0.9, window:int=16, min_samples:int=8,
+                 snr_margin:float=0.0, rssi_margin:float=-110.0, confirmed:bool=True,
+                 custom:Optional[bytes]=None, txpowoffs:Tuple=(0, -2, -4, -6), holdoff:int=32, max_holdoff:int=2048,
+                 dry_run:bool=False):
+        """
+        target:      required ratio of delivered uplinks
+        window:      number of outcomes and signal reports kept
+        min_samples: outcomes required before a step towards efficient
+        snr_margin:  minimum SNR [dB] of all downlinks in window to step towards efficient
+        rssi_margin: minimum mean RSSI [dBm] in window to step towards efficient
+        confirmed:   uplinks are confirmed, only acknowledged frames count as delivered
+                     (otherwise every frame sent counts, and the ratio says little)
+        custom:      16 data rates of a custom profile inserted between long-range and low-power
+        txpowoffs:   TX power offsets [dB] tried with the low-power profile
+        holdoff:     uplinks before a failed step is probed again, doubled on each repeated failure
+        max_holdoff: maximum hold-off [uplinks]
+        """
+        self.m = modem
+        self.target = target
+        self.min_samples = min_samples
+        self.snr_margin = snr_margin
+        self.rssi_margin = rssi_margin
+        self.confirmed = confirmed
+        self.holdoff = holdoff
+        self.max_holdoff = max_holdoff
+        self.dry_run = dry_run
+        self.ladder = [(ModemDefs.ADRP_LONGRANGE, b'', 0)]
+        if custom is not None:
+            self.ladder.append((ModemDefs.ADRP_CUSTOM, custom, 0))
+        self.ladder += [(ModemDefs.ADRP_LOWPOWER, b'', off) for off in txpowoffs]
+        self.outcomes = deque(maxlen=window)   # True: delivered
+        self.signal = deque(maxlen=window)     # (rssi, snr)
+        self.decisions = []                    # logged decisions
+        self.uplinks = 0                       # TXDONE events seen
+        self.failures = {}                     # step -> consecutive failures
+        self.held = {}                         # step -> uplink count until which it is not probed
+        self.step = self.current()
+
+    @property
+    def ratio(self) -> Optional[float]:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else None
+
+    def event(self, evt:Optional[Event]) -> Optional[Event]:
+        if evt is None:
+            return evt
+        if evt.type == ModemDefs.EVT_DOWNDATA:
+            (rssi, snr) = unpack_from('bb', evt.data)
+            self.signal.append((rssi - 64, snr * 0.25))
+        elif evt.type == ModemDefs.EVT_TXDONE:
+            self.uplinks += 1
+            self.outcomes.append(evt.data[0] == 0x02 if self.confirmed else evt.data[0] != 0x00)
+            self.decide()
+        return evt
+
+    # ladder step of the modem's current setting (closest step if not on the ladder)
+    def current(self) -> int:
+        try:
+            pro = self.m.getprofile()
+            off = self.m.gettxpowoff()
+        except Exception as ex:
+            self.log(0, None, None, 'cannot read current setting, assuming most robust', error=str(ex))
+            return 0
+        steps = [i for i, (p, _, _) in enumerate(self.ladder) if p == pro]
+        step = min(steps, key=lambda i: abs(self.ladder[i][2] - off)) if steps else 0
+        self.log(step, pro, off, 'current setting' + ('' if steps else ', not on ladder'))
+        return step
+
+    def decide(self):
+        ratio = self.ratio
+        if ratio < self.target and len(self.outcomes) >= self.min_samples // 2:
+            if self.step > 0:
+                n = self.failures[self.step] = self.failures.get(self.step, 0) + 1
+                hold = min(self.holdoff << (n - 1), self.max_holdoff)
+                self.held[self.step] = self.uplinks + hold
+                self.apply(self.step - 1, 'delivery %.2f below target %.2f, step %d held off for %d uplinks' %
+                           (ratio, self.target, self.step, hold))
+        elif ratio >= self.target and len(self.outcomes) >= self.min_samples:
+            if len(self.outcomes) == self.outcomes.maxlen:
+                self.failures.pop(self.step, None)
+            if self.step == len(self.ladder) - 1 or self.uplinks < self.held.get(self.step + 1, 0):
+                return
+            if not self.signal:
+                self.apply(self.step + 1, 'delivery %.2f, no downlink signal reports' % ratio)
+                return
+            snr = min(s for _, s in self.signal)
+            rssi = sum(r for r, _ in self.signal) / len(self.signal)
+            if snr >= self.snr_margin and rssi >= self.rssi_margin:
+                self.apply(self.step + 1, 'delivery %.2f, SNR min %.1fdB, RSSI mean %.1fdBm' % (ratio, snr, rssi))
+
+    def apply(self, step:int, reason:str):
+        (pro, custom, off) = self.ladder[step]
+        if not self.dry_run:
+            try:
+                self.m.setprofile(pro, custom)
+                self.m.settxpowoff(off)
+            except Exception as ex:
+                # the profile may be changed already, the next decision applies both again
+                self.log(step, pro, off, reason, error=str(ex))
+                return
+        self.log(step, pro, off, reason)
+        self.step = step
+        self.outcomes.clear()
+
+    def log(self, step:int, pro:Optional[int], off:Optional[int], reason:str, error:Optional[str]=None):
+        rec = { 'time': time.time(), 'step': step, 'profile': Modem.adrnames.get(pro), 'txpowoff': off,
+                'reason': reason, 'dry_run': self.dry_run, 'error': error }
+        self.decisions.append(rec)
+        print('ADR: %s%s%s txpowoff=%sdB (%s)' % ('[dry-run] ' if self.dry_run else '', 'FAILED ' if error else '',
+                                                 rec['profile'], off, reason + (': ' + error if error else '')))
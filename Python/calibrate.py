@@ -0,0 +1,164 @@
+"""
+Copyright (C) Gonzalo Casas 2020
+Distributed under the MIT License (license terms are at http://opensource.org/licenses/MIT).
+"""
+
+#
+# Calibration of the serial link timing for the connected USB-serial adapter.
+#
+# Measures with read-only commands
+#  - the time until BUSY goes low after asserting COMMAND,
+#  - the response latency per command class,
+#  - the gaps between response bytes,
+# and searches the shortest time COMMAND must stay asserted after writing a packet.
+# Response timeouts are derived per measured command class; all other commands, including
+# every write command, keep the default timeout. Timeouts never go below the limits of the
+# reference manual, the time saved comes from the shorter write delay. The derived profile
+# is verified with packets of maximum length, then stored under the adapter's serial
+# number and loaded by Modem whenever that adapter is connected.
+#
+#   $ python calibrate.py /dev/ttyUSB0
+#
+
+from typing import List, Tuple
+
+import sys
+import time
+
+import modemdefs as ModemDefs
+from modem import Modem, Timing, CLASSES, COMMANDS
+
+# request of maximum length: an invalid test command, which the modem rejects without
+# effect, but only after receiving it completely and checking its LRC
+LONGEST = COMMANDS[ModemDefs.CMD_TEST].encode((b'\xff' * 255,))
+
+# write delays tried, longest first [s]
+WRITE_DELAYS = (0.025, 0.015, 0.010, 0.006, 0.004, 0.002, 0.001, 0.0)
+
+# safety factor applied to measured maxima
+MARGIN = 3
+
+# limits guaranteed by the reference manual; waits end as soon as BUSY drops or the response
+# arrives, so shorter timeouts save nothing and only fail slow exchanges that are within spec [s]
+BUSY_MAX = 0.010
+RESPONSE_MAX = 0.200
+
+
+# one instrumented command exchange -> (busy, latency, gaps, ok)
+def exchange(m:Modem, cmd:int, write_delay:float, byte_time:float) -> Tuple[float, float, List[float], bool]:
+    pkt = Modem.make_packet(cmd)
+    ser = m.ser
+    ser.rts = True
+    t0 = time.perf_counter()
+    while ser.cts == False:
+        if time.perf_counter() - t0 > 0.5:
+            ser.rts = False
+            return (0.5, 0.0, [], False)
+    busy = time.perf_counter() - t0
+    ser.write(pkt)
+    time.sleep(write_delay + len(pkt) * byte_time)
+    ser.rts = False
+    t1 = time.perf_counter()
+    buf = bytearray()
+    gaps = []
+    latency = 0.0
+    last = None
+    while len(buf) < 3 or len(buf) < 3 + buf[1]:
+        b = ser.read()
+        now = time.perf_counter()
+        if len(b) != 1:
+            break
+        if last is None:
+            latency = now - t1
+        else:
+            gaps.append(now - last)
+        last = now
+        buf += b
+    ok = len(buf) >= 3 and len(buf) == 3 + buf[1] and Modem.lrc(buf) == 0 and buf[0] == ModemDefs.RC_OK
+    return (busy, latency, gaps, ok)
+
+
+def recover(m:Modem):
+    # let the modem discard a broken command and drop any late response bytes
+    time.sleep(0.2)
+    m.ser.reset_input_buffer()
+
+
+def calibrate(m:Modem, rounds:int=20) -> Timing:
+    byte_time = 10 / m.ser.baudrate
+    # generous read timeouts while measuring
+    m.ser.timeout = 1
+    m.ser.inter_byte_timeout = 0.1
+
+    # BUSY, latency and inter-byte gaps with the default write delay
+    busy, gaps = [], []
+    latency = {}
+    for name, cmds in CLASSES.items():
+        latency[name] = []
+        for i in range(rounds):
+            (b, l, g, ok) = exchange(m, cmds[i % len(cmds)], Timing().write_delay, byte_time)
+            if not ok:
+                raise RuntimeError('modem does not respond with default timing')
+            busy.append(b)
+            latency[name].append(l)
+            gaps += g
+
+    # shortest write delay without failures
+    write_delay = WRITE_DELAYS[0]
+    for i, delay in enumerate(WRITE_DELAYS):
+        if all(exchange(m, ModemDefs.CMD_GETSTATUS, delay, byte_time)[3] for _ in range(rounds)):
+            # keep one step of margin to the shortest working delay
+            write_delay = WRITE_DELAYS[max(i - 1, 0)]
+        else:
+            recover(m)
+            break
+
+    measured = {
+        'busy_max': max(busy),
+        'latency_max': { name: max(l) for name, l in latency.items() },
+        'latency_mean': { name: sum(l) / len(l) for name, l in latency.items() },
+        'gap_max': max(gaps) if gaps else 0.0,
+    }
+    return Timing(timeouts={ name: max(MARGIN * l, RESPONSE_MAX) for name, l in measured['latency_max'].items() },
+                  inter_byte_timeout=max(MARGIN * measured['gap_max'], 0.002),
+                  busy_timeout=max(MARGIN * measured['busy_max'], BUSY_MAX),
+                  write_delay=write_delay,
+                  byte_time=byte_time,
+                  measured=measured)
+
+
+# exchange commands of all classes and a maximum-length packet with the derived profile
+def verify(m:Modem, rounds:int=20):
+    for i in range(rounds):
+        for cmds in CLASSES.values():
+            m.call(cmds[i % len(cmds)])
+        m.set_timeout(ModemDefs.CMD_TEST)
+        m.send_packet(LONGEST)
+        rsp = m.read_packet()
+        if rsp is None or rsp[0] in (ModemDefs.RC_BADCRC, ModemDefs.RC_BADSIZE):
+            raise RuntimeError('maximum-length packet not received correctly')
+
+
+if __name__ == '__main__':
+    # select serial port
+    port = sys.argv[1] if len(sys.argv) == 2 else '/dev/ttyUSB0'
+
+    serial_number = Modem.adapter_serial(port)
+    if serial_number is None:
+        sys.exit('no USB serial number found for %s, cannot store profile' % port)
+
+    m = Modem(port, Timing())
+    timing = calibrate(m)
+    m.ser.close()
+
+    for name, l in timing.measured['latency_max'].items():
+        print('latency %-8s mean=%.2fms max=%.2fms' % (name, timing.measured['latency_mean'][name]*1e3, l*1e3))
+    print('BUSY max=%.2fms, inter-byte gap max=%.2fms' % (timing.measured['busy_max']*1e3, timing.measured['gap_max']*1e3))
+    print('adapter %s: %s' % (serial_number, timing))
+
+    # verify derived profile before storing it
+    m = Modem(port, timing)
+    verify(m)
+    m.ser.close()
+    timing.save(serial_number)
+    print('saved to %s' % Timing.PATH)
@@ -0,0 +1,257 @@
+"""
+Copyright (C) Gonzalo Casas 2020
+Distributed under the MIT License (license terms are at http://opensource.org/licenses/MIT).
+"""
+
+#
+# Decoder for the device management (DM) status messages sent by the modem on the DM port.
+#
+# A DM message is a concatenation of info fields, each starting with a one-byte INF_* tag
+# followed by the field content (see "Uplink Message Format" in the reference manual).
+# Multi-byte integers are transmitted least-significant-byte-first. Fields with a variable
+# length always come last and extend to the end of the message.
+#
+# decode() turns one message into a dict, decode_batch() turns a whole archive of messages
+# into typed columns (NumPy arrays if NumPy is installed, array.array otherwise) plus a
+# presence mask per column, e.g. with NumPy
+#
+#   cols, mask = decode_batch(payloads)
+#   cols['voltage'][mask['voltage']].mean()
+#
+# and without NumPy (mask is a bytearray of 0/1)
+#
+#   volts = [v for v, ok in zip(cols['voltage'], mask['voltage']) if ok]
+#
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sys
+from array import array
+from operator import itemgetter
+from struct import Struct
+
+import modemdefs as ModemDefs
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _interval(x):
+    # top two bits: unit (sec=00, day=01, hour=10, min=11), lower six bits: value
+    unit = x >> 6
+    return (x & 0x3F) * ((unit == 0) * 1 + (unit == 1) * 60*60*24 + (unit == 2) * 60*60 + (unit == 3) * 60)
+
+
+# INF_* code -> size in bytes (None: variable) and list of (column, struct format, result typecode, conversion)
+FIELDS = {
+    ModemDefs.INF_STATUS:    (1, [('status',    'B', 'B', None)]),
+    ModemDefs.INF_CHARGE:    (2, [('charge',    'H', 'H', None)]),                  # mAh
+    ModemDefs.INF_VOLTAGE:   (1, [('voltage',   'B', 'd', lambda x: x / 50)]),      # V
+    ModemDefs.INF_TEMP:      (1, [('temp',      'b', 'b', None)]),                  # deg C
+    ModemDefs.INF_SIGNAL:    (2, [('rssi',      'b', 'h', lambda x: x - 64),        # dBm
+                                  ('snr',       'b', 'd', lambda x: x * 0.25)]),    # dB
+    ModemDefs.INF_UPTIME:    (2, [('uptime',    'H', 'H', None)]),                  # h
+    ModemDefs.INF_RXTIME:    (2, [('rxtime',    'H', 'H', None)]),                  # h
+    ModemDefs.INF_FIRMWARE:  (8, [('fwcrc',     'I', 'I', None),
+                                  ('fwdone',    'H', 'H', None),
+                                  ('fwtotal',   'H', 'H', None)]),
+    ModemDefs.INF_ADRMODE:   (1, [('adrmode',   'B', 'B', None)]),
+    ModemDefs.INF_JOINEUI:   (8, [('joineui',   'Q', 'Q', None)]),
+    ModemDefs.INF_INTERVAL:  (1, [('interval',  'B', 'I', _interval)]),             # s
+    ModemDefs.INF_REGION:    (1, [('region',    'B', 'B', None)]),
+    ModemDefs.INF_CRASHLOG:  (None, [('crashlog',  's', None, None)]),
+    ModemDefs.INF_UPLOAD:    (None, [('upload',    's', None, None)]),
+    ModemDefs.INF_RSTCOUNT:  (2, [('rstcount',  'H', 'H', None)]),
+    ModemDefs.INF_DEVEUI:    (8, [('deveui',    'Q', 'Q', None)]),
+    ModemDefs.INF_SESSION:   (2, [('session',   'H', 'H', None)]),
+    ModemDefs.INF_CHIPEUI:   (8, [('chipeui',   'Q', 'Q', None)]),
+    ModemDefs.INF_STREAM:    (None, [('stream',    's', None, None)]),
+    ModemDefs.INF_STREAMPAR: (2, [('streampar', 'H', 'H', None)]),
+    ModemDefs.INF_APPSTATUS: (8, [('appstatus', '8s', None, None)]),
+    ModemDefs.INF_ALCSYNC:   (None, [('alcsync',   's', None, None)]),
+}
+
+# all columns in table order: name -> result typecode (None: bytes)
+COLUMNS = { name:tc for (_, cols) in FIELDS.values() for (name, _, tc, _) in cols }
+
+
+# return tuple of INF_* codes contained in DM message
+def layout(payload:bytes) -> Tuple:
+    codes = []
+    pos = 0
+    while pos < len(payload):
+        code = payload[pos]
+        if code not in FIELDS:
+            raise ValueError('unknown DM info field 0x%02X at offset %d' % (code, pos))
+        size = FIELDS[code][0]
+        if size is None:
+            size = len(payload) - pos - 1
+        pos += 1 + size
+        codes.append(code)
+    if pos != len(payload):
+        raise ValueError('truncated DM info field 0x%02X' % codes[-1])
+    return tuple(codes)
+
+
+class Plan:
+    """
+    Precompiled decoder for all DM messages with the same field layout and length.
+    """
+    def __init__(self, codes:Tuple, length:int):
+        fixed = sum(1 + (FIELDS[c][0] or 0) for c in codes)
+        # tag offsets: a message of this length with these tags at these offsets has this layout
+        offsets = []
+        pos = 0
+        for code in codes:
+            offsets.append(pos)
+            pos += 1 + (FIELDS[code][0] or length - fixed)
+        self.codes = codes
+        self.offsets = offsets
+        self.tags_at = itemgetter(*offsets)
+        self.tags = codes if len(codes) > 1 else codes[0]
+        fmt = '<'
+        self.columns = []
+        for code in codes:
+            size, cols = FIELDS[code]
+            fmt += 'x'
+            for (name, f, tc, conv) in cols:
+                fmt += ('%ds' % (length - fixed)) if f == 's' else f
+                self.columns.append((name, tc, conv))
+        self.struct = Struct(fmt)
+        if np is not None:
+            # same layout as structured dtype for vectorized decoding of the numeric fields
+            names, formats, offsets = [], [], []
+            pos = 0
+            for code in codes:
+                size, cols = FIELDS[code]
+                pos += 1
+                for (name, f, tc, conv) in cols:
+                    if tc is not None:
+                        names.append(name)
+                        formats.append('<' + f)
+                        offsets.append(pos)
+                    pos += (length - fixed) if f == 's' else Struct('<' + f).size
+            self.dtype = np.dtype({ 'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': length })
+
+    def decode(self, payload:bytes) -> Dict:
+        rec = {}
+        for ((name, tc, conv), val) in zip(self.columns, self.struct.unpack(payload)):
+            rec[name] = conv(val) if conv else val
+        return rec
+
+
+# (length, first tag) -> plans, checked against the tags of a message instead of walking its layout
+_plans = {}
+
+def plan(payload:bytes) -> Plan:
+    if not payload:
+        raise ValueError('empty DM message')
+    key = (len(payload), payload[0])
+    plans = _plans.get(key, ())
+    for p in plans:
+        if p.tags_at(payload) == p.tags:
+            return p
+    p = Plan(layout(payload), len(payload))
+    _plans.setdefault(key, []).append(p)
+    return p
+
+
+# decode single DM message into dict of field values
+def decode(payload:bytes) -> Dict:
+    return plan(payload).decode(payload)
+
+
+# group messages by plan -> [(plan, indices, concatenated messages)], messages that cannot be decoded are left out
+def _groups(payloads:List[bytes]) -> List[Tuple]:
+    groups = {}
+    get = _plans.get
+    for i, payload in enumerate(payloads):
+        for p in get((len(payload), payload[0]) if payload else None, ()):
+            if p.tags_at(payload) == p.tags:
+                break
+        else:
+            try:
+                p = plan(payload)
+            except ValueError:
+                continue
+        idx = groups.get(p)
+        if idx is None:
+            groups[p] = [i]
+        else:
+            idx.append(i)
+    return [(p, idx, b''.join([payloads[i] for i in idx])) for p, idx in groups.items()]
+
+
+# same with NumPy: messages of equal length are matched against each plan's tags in one go
+def _groups_np(payloads:List[bytes]) -> List[Tuple]:
+    groups = []
+    lens = np.fromiter(map(len, payloads), dtype=np.int64, count=len(payloads))
+    for length in np.unique(lens):
+        if length == 0:
+            continue
+        idx = np.flatnonzero(lens == length)
+        sel = itemgetter(*idx)(payloads) if len(idx) > 1 else (payloads[idx[0]],)
+        rows = np.frombuffer(b''.join(sel), dtype=np.uint8).reshape(-1, length)
+        todo = np.ones(len(idx), dtype=bool)
+        while todo.any():
+            first = int(np.argmax(todo))
+            try:
+                p = plan(sel[first])
+            except ValueError:
+                todo[first] = False
+                continue
+            match = todo & (rows[:, p.offsets] == p.codes).all(axis=1)
+            todo &= ~match
+            groups.append((p, idx[match], rows[match].tobytes()))
+    return groups
+
+
+# decode many DM messages into columns: (name -> column, name -> presence mask)
+def decode_batch(payloads:Iterable[bytes], columns:Optional[List[str]]=None) -> Tuple[Dict, Dict]:
+    payloads = payloads if isinstance(payloads, list) else list(payloads)
+    n = len(payloads)
+    names = columns or list(COLUMNS)
+
+    if np is not None:
+        cols = { name: (np.zeros(n, dtype=np.dtype(COLUMNS[name])) if COLUMNS[name] else np.full(n, None, dtype=object)) for name in names }
+        mask = { name: np.zeros(n, dtype=bool) for name in names }
+        for p, idx, buf in _groups_np(payloads):
+            recs = np.frombuffer(buf, dtype=p.dtype)
+            for k, (name, tc, conv) in enumerate(p.columns):
+                if name not in cols:
+                    continue
+                if tc is None:
+                    cols[name][idx] = [rec[k] for rec in p.struct.iter_unpack(buf)]
+                else:
+                    raw = recs[name]
+                    cols[name][idx] = conv(raw.astype(np.int64)) if conv else raw
+                mask[name][idx] = True
+    else:
+        cols = { name: (array(COLUMNS[name], [0]) * n if COLUMNS[name] else [None] * n) for name in names }
+        mask = { name: bytearray(n) for name in names }
+        for p, idx, buf in _groups(payloads):
+            sel = [(k, name, conv) for k, (name, tc, conv) in enumerate(p.columns) if name in cols]
+            for i, vals in zip(idx, p.struct.iter_unpack(buf)):
+                for (k, name, conv) in sel:
+                    cols[name][i] = conv(vals[k]) if conv else vals[k]
+                    mask[name][i] = 1
+    return cols, mask
+
+
+if __name__ == '__main__':
+    # read archive with one hex-encoded DM message per line and print per-column statistics
+    with open(sys.argv[1]) if len(sys.argv) == 2 else sys.stdin as f:
+        payloads = [bytes.fromhex(line.split()[-1]) for line in f if line.strip()]
+
+    cols, mask = decode_batch(payloads)
+    print('%d messages' % len(payloads))
+    for name, tc in COLUMNS.items():
+        vals = [v for v, m in zip(cols[name], mask[name]) if m]
+        if not vals:
+            continue
+        if tc is None or name.endswith('eui'):
+            print('%-10s %8d' % (name, len(vals)))
+        else:
+            print('%-10s %8d  min=%g mean=%g max=%g' % (name, len(vals), min(vals), sum(vals) / len(vals), max(vals)))
@@ -0,0 +1,177 @@
+"""
+Copyright (C) Gonzalo Casas 2020
+Distributed under the MIT License (license terms are at http://opensource.org/licenses/MIT).
+"""
+
+#
+# Energy accounting for modem operations based on the modem's charge counter.
+#
+# The profiler wraps the operations that cause radio activity (tx, join, upload, stream)
+# and reads the charge counter once when an operation is started and once when the
+# matching completion event (TXDONE, JOINED/JOINFAIL, UPLOADDONE, STREAMDONE) is passed
+# to event(). No commands are issued while waiting, so polling cost stays unchanged.
+#
+# The charge counter has a resolution of 1 mAh, so single deltas are coarse, but the
+# totals over many operations give accurate averages. The charge accumulated between
+# operations is accounted as idle charge and used for the sleep part of the projection.
+# An operation whose completion event never arrived before the next one started is counted
+# as '<op>-lost'. If reading the charge counter fails, the operation is not profiled, but
+# the operation itself and the event are never held up.
+#
+#   prof = EnergyProfiler(m)
+#   prof.tx(1, payload)
+#   ...
+#   prof.event(m.getevent())
+#   print(prof)
+#   prof.lifetime(capacity=2400, period=300, size=4)  # -> days
+#
+
+from typing import Optional
+
+import time
+
+import modemdefs as ModemDefs
+from modem import Modem, Event
+
+
+# completion events per operation
+DONE = {
+    'tx':     (ModemDefs.EVT_TXDONE,),
+    'join':   (ModemDefs.EVT_JOINED, ModemDefs.EVT_JOINFAIL),
+    'upload': (ModemDefs.EVT_UPLOADDONE,),
+    'stream': (ModemDefs.EVT_STREAMDONE,),
+}
+
+
+class Stats:
+    def __init__(self):
+        self.count = 0
+        self.charge = 0      # mAh
+        self.size = 0        # payload bytes
+        self.duration = 0.0  # s
+        self.size2 = 0       # sum of size^2
+        self.size_charge = 0 # sum of size * mAh
+
+    def add(self, size:int, charge:int, duration:float):
+        self.count += 1
+        self.charge += charge
+        self.size += size
+        self.duration += duration
+        self.size2 += size * size
+        self.size_charge += size * charge
+
+    @property
+    def mean(self) -> float:
+        return self.charge / self.count if self.count else 0.0
+
+    # mAh per operation for payload size (least-squares fit from the running sums, mean if sizes don't vary)
+    def estimate(self, size:int) -> float:
+        n = self.count
+        if n == 0:
+            return 0.0
+        # n^2 times variance and covariance, exact for integer sizes and charges
+        var = n * self.size2 - self.size * self.size
+        if var == 0:
+            return self.charge / n
+        slope = (n * self.size_charge - self.size * self.charge) / var
+        return max(0.0, (self.charge + slope * (n * size - self.size)) / n)
+
+
+class EnergyProfiler:
+    def __init__(self, modem:Modem, reset:bool=False):
+        self.m = modem
+        if reset:
+            self.m.resetcharge()
+        self.stats = {}             # (op, port) -> Stats
+        self.idle_charge = 0        # mAh
+        self.idle_time = 0.0        # s
+        self._pending = None        # (op, port, size, charge, time)
+        self._last = None           # (charge, time) at end of last operation
+
+    def _start(self, op:str, port:Optional[int], size:int):
+        if self._pending is not None:
+            (pop, pport, psize, charge, t) = self._pending
+            if (pop, pport) == (op, port) and op == 'stream':
+                # further records for the same stream complete with the same STREAMDONE
+                self._pending = (pop, pport, psize + size, charge, t)
+                return
+        charge = self._charge()
+        t = time.time()
+        if self._pending is not None:
+            print('Energy: no completion event for %s, counted as lost' % self._pending[0])
+            self._account(self._pending[0] + '-lost', charge, t)
+        elif self._last is not None and charge is not None:
+            self.idle_charge += charge - self._last[0]
+            self.idle_time += t - self._last[1]
+        self._pending = (op, port, size, charge, t) if charge is not None else None
+
+    def _done(self, ok:bool):
+        op = self._pending[0]
+        self._account(op if ok else op + '-failed', self._charge(), time.time())
+
+    def _charge(self) -> Optional[int]:
+        try:
+            return self.m.getcharge()
+        except Exception as ex:
+            print('Energy: cannot read charge: %s' % ex)
+            return None
+
+    # account pending operation as op with charge read at time t (None: not available)
+    def _account(self, op:str, charge:Optional[int], t:float):
+        (_, port, size, charge0, t0) = self._pending
+        self._pending = None
+        if charge is None:
+            self._last = None
+            return
+        self._last = (charge, t)
+        self.stats.setdefault((op, port), Stats()).add(size, charge - charge0, t - t0)
+
+    # profiled operations...
+
+    def tx(self, port:int, payload:bytes, emergency=False, confirmed=False):
+        self._start('tx', port, len(payload))
+        self.m.tx(port, payload, emergency, confirmed)
+
+    def join(self):
+        self._start('join', None, 0)
+        self.m.join()
+
+    def upload(self, port:int, data, enc=False, delay=5):
+        data = Modem.getbytes(data)
+        self._start('upload', port, len(data))
+        self.m.upload(port, data, enc, delay)
+
+    def streamdata(self, port:int, record:bytes):
+        self._start('stream', port, len(record))
+        self.m.streamdata(port, record)
+
+    # pass every event received from the modem, returns the event
+    def event(self, evt:Optional[Event]) -> Optional[Event]:
+        if evt is not None and self._pending is not None and evt.type in DONE[self._pending[0]]:
+            if evt.type == ModemDefs.EVT_TXDONE or evt.type == ModemDefs.EVT_UPLOADDONE:
+                ok = evt.data[0] != 0x00
+            else:
+                ok = evt.type != ModemDefs.EVT_JOINFAIL
+            self._done(ok)
+        return evt
+
+    # mAh per hour between operations
+    @property
+    def idle_rate(self) -> float:
+        return self.idle_charge / self.idle_time * 60*60 if self.idle_time > 0 else 0.0
+
+    # projected battery lifetime in days for a periodic application sending size bytes on port
+    def lifetime(self, capacity:float, period:float, size:int, port:int=1) -> float:
+        st = self.stats.get(('tx', port))
+        if st is None or st.count == 0:
+            raise ValueError('no tx measurements on port %d' % port)
+        per_day = (60*60*24 / period) * st.estimate(size) + 24 * self.idle_rate
+        return capacity / per_day if per_day > 0 else float('inf')
+
+    def __str__(self):
+        s = ''
+        for (op, port), st in sorted(self.stats.items(), key=lambda x: (x[0][0], x[0][1] or 0)):
+            s += '%-14s port=%-3s count=%-5d charge=%d mAh  mean=%.3f mAh  avg size=%.1f B  avg duration=%.1f s\n' % (
+                op, '-' if port is None else port, st.count, st.charge, st.mean, st.size / st.count, st.duration / st.count)
+        s += 'idle           %.4f mAh/h (%d mAh in %.1f h)\n' % (self.idle_rate, self.idle_charge, self.idle_time / (60*60))
+        return s
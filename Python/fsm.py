@@ -4,10 +4,12 @@ Distributed under the MIT License (license terms are at http://opensource.org/li
 """
 
 from enum import Enum, auto
-import random
 import struct
 import sys
 from modem import Modem
+from energy import EnergyProfiler
+from adr import LinkController
+from acquisition import Acquisition, Source, simulated_temperature
 import modemdefs as ModemDefs
 import time
 
@@ -23,24 +25,48 @@ class Application:
     def __init__(self,
                  ser_port='/dev/ttyUSB0',
                  port=1,
-                 period=300):
+                 period=300,
+                 energy=False,
+                 sources=None,
+                 stats=('mean',),
+                 adr=None):
         """
         Simple application transmitting every period seconds.
         The application is intended to simulate an MCU application, it
         therefore assumes that the modem is reset before executing run()
+        If energy is set, the charge used by join and tx is profiled.
+        The sensor sources are sampled in the background, each uplink
+        carries the given stats (min, mean, max) of every source over the
+        samples collected since the previous uplink.
+        If adr is 'on' or 'dry-run', ADR profile and TX power are adapted
+        to the link quality reported by downlinks and TXDONE events; the
+        uplinks are then sent confirmed to measure delivery.
         """
         self.m = Modem(ser_port)
+        self.energy = EnergyProfiler(self.m) if energy else None
+        self.adr = LinkController(self.m, confirmed=True, dry_run=(adr == 'dry-run')) if adr else None
         self.state = State.INIT
         self._poll_time = 1
         self._period = period
         self._clock = period
         self._port = port
-    
+        self._stats = stats
+        # default source sampled every second, with room for two uplink periods as uplinks may be delayed
+        self.acq = Acquisition(sources or [Source('temperature', simulated_temperature, period=1.0, size=max(256, 2 * period))])
+
     def measure(self):
-        # Simulates a temperature sensor (for instance)
-        value = round(random.uniform(17.0, 24.0),1)
-        print(f"Sensor measure: {value} C")
-        return  bytearray(struct.pack("f", value))
+        payload = bytearray()
+        for name, window in self.acq.collect().items():
+            if window is None:
+                print(f"Sensor {name}: no samples")
+                values = [float('nan')] * len(self._stats)
+            else:
+                values = [window[x] for x in self._stats]
+                print(f"Sensor {name}: " + ", ".join(f"{x}={v:.1f}" for x, v in zip(self._stats, values)) + f" ({window['n']} samples)")
+                if window['overflows']:
+                    print(f"Sensor {name}: {window['overflows']} samples overwritten since last uplink")
+            payload += struct.pack("f" * len(values), *values)
+        return payload
 
     def _get_event(self):
         try:
@@ -50,6 +76,16 @@ class Application:
             print(f"Exception: {ex}")
             return None
 
+    def _observe(self, evt):
+        # profiler and controller see the event after the state machine handled it,
+        # they deal with their own command errors
+        if self.energy:
+            self.energy.event(evt)
+            if evt is not None and evt.type == ModemDefs.EVT_TXDONE:
+                print(self.energy, end='')
+        if self.adr:
+            self.adr.event(evt)
+
     def _get_state(self):
         time.sleep(self._poll_time)
         evt = self._get_event()
@@ -72,14 +108,16 @@ class Application:
                 print("EVT DOWNDATA")
                 print(f"Got something: {evt.data}")
 
+        self._observe(evt)
         return evt
 
     def run(self):
+        self.acq.start()
         self._get_state()
         print("Joining ...")
         while True:
             if self.state == State.INIT:
-                self.m.join()
+                (self.energy or self.m).join()
                 self.state = State.JOINING
             elif self.state == State.JOINING:
                 self._get_state()
@@ -89,7 +127,7 @@ class Application:
                 self._get_state()
                 if self._clock == self._period:
                     self._clock = 0
-                    self.m.tx(self._port, self.measure())
+                    (self.energy or self.m).tx(self._port, self.measure(), confirmed=self.adr is not None)
                     print("Sending data")
                     self.state = State.TRANSMITTING
                     print("Awaiting TX complete ...")
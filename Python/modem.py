@@ -20,11 +20,14 @@ Distributed under the MIT License (license terms are at http://opensource.org/li
 
 from typing import List, Optional, Tuple, Union
 
+import os
 import sys
+import json
 import time
 import string
 from serial import Serial
-from struct import pack, unpack, unpack_from
+from serial.tools import list_ports
+from struct import Struct, unpack, unpack_from
 from binascii import crc32
 from datetime import datetime, timedelta
 
@@ -42,6 +45,222 @@ class CommandError(Exception):
         return 'command failed ' + CommandError.rcnames.get(self.rc, str(self.rc))
 
 
+def lrc(buf:bytes) -> int:
+    if len(buf) < 64:
+        x = 0
+        for b in buf:
+            x ^= b
+        return x
+    # longer buffers: XOR halves of the buffer as one integer down to a 64-bit word, then fold that
+    x = int.from_bytes(buf, 'little')
+    bits = len(buf) << 3
+    while bits > 64:
+        half = ((bits >> 1) + 63) & ~63
+        x = (x ^ (x >> half)) & ((1 << half) - 1)
+        bits = half
+    x ^= x >> 32
+    x ^= x >> 16
+    x ^= x >> 8
+    return x & 0xFF
+
+
+# single-byte LRC values, so a packet is assembled without converting the LRC each time
+LRCBYTES = [bytes((x,)) for x in range(256)]
+
+
+class Command:
+    """
+    Descriptor of a modem command: request and response layout as big-endian struct format,
+    a trailing '*' denotes a variable-length bytes field at the end of the payload.
+    The layouts are compiled once, header and fixed request fields are packed in one go.
+    """
+    def __init__(self, code:int, req:str='', rsp:str=''):
+        self.code = code
+        self.name = Command.cmdnames.get(code, str(code))
+        self.req, self.req_var, self.req_n = Command.compile(req)
+        self.rsp, self.rsp_var, self.rsp_n = Command.compile(rsp)
+        self.nargs = self.req_n + self.req_var
+        # CMD[1] LEN[1] + fixed request fields
+        self.head = Struct('>BB' + req.rstrip('*'))
+        # commands without request data always have the same packet
+        self.packet = bytes([code, 0, code]) if self.nargs == 0 else None
+
+    cmdnames = { v:n[4:] for n,v in vars(ModemDefs).items() if n.startswith('CMD_') }
+
+    @staticmethod
+    def compile(fmt:str) -> Tuple:
+        var = fmt.endswith('*')
+        st = Struct('>' + fmt.rstrip('*'))
+        return (st, var, len(st.unpack(bytes(st.size))))
+
+    # encode packet CMD[1] LEN[1] DATA[...] LRC[1]
+    def encode(self, args:Tuple) -> bytes:
+        if len(args) != self.nargs:
+            raise TypeError('%s takes %d arguments' % (self.name, self.nargs))
+        if self.packet is not None:
+            return self.packet
+        if self.req_var:
+            tail = args[-1]
+            n = self.req.size + len(tail)
+            if n > 255:
+                raise ValueError('%s payload too long' % self.name)
+            head = self.head.pack(self.code, n, *args[:-1])
+            if n >= 64:
+                return b''.join((head, tail, LRCBYTES[lrc(head) ^ lrc(tail)]))
+            pkt = head + tail
+        else:
+            pkt = self.head.pack(self.code, self.req.size, *args)
+        # short packets: plain loop, inlined
+        x = 0
+        for b in pkt:
+            x ^= b
+        return pkt + LRCBYTES[x]
+
+    # decode response data -> None / value / tuple of values
+    def decode(self, data:bytes):
+        size = self.rsp.size
+        if len(data) < size or (not self.rsp_var and len(data) != size):
+            raise CommandError(ModemDefs.RC_BADSIZE)
+        vals = self.rsp.unpack_from(data)
+        if self.rsp_var:
+            vals += (data[size:],)
+        return vals[0] if len(vals) == 1 else (vals if vals else None)
+
+
+# request and response layouts of all modem commands
+COMMANDS = { c.code:c for c in [
+    Command(ModemDefs.CMD_GETEVENT,            '',         '*'),
+    Command(ModemDefs.CMD_GETVERSION,          '',         'IIH'),
+    Command(ModemDefs.CMD_RESET),
+    Command(ModemDefs.CMD_FACTORYRESET),
+    Command(ModemDefs.CMD_RESETCHARGE),
+    Command(ModemDefs.CMD_GETCHARGE,           '',         'I'),
+    Command(ModemDefs.CMD_GETTXPOWEROFFSET,    '',         'b'),
+    Command(ModemDefs.CMD_SETTXPOWEROFFSET,    'b'),
+    Command(ModemDefs.CMD_TEST,                '*',        '*'),
+    Command(ModemDefs.CMD_FIRMWAREUPDATE,      'HH*'),
+    Command(ModemDefs.CMD_GETTIME,             '',         'I'),
+    Command(ModemDefs.CMD_GETSTATUS,           '',         'B'),
+    Command(ModemDefs.CMD_SETALARMTIMER,       'I'),
+    Command(ModemDefs.CMD_GETTRACE,            '',         '*'),
+    Command(ModemDefs.CMD_GETPIN,              '',         '*'),
+    Command(ModemDefs.CMD_GETCHIPEUI,          '',         '8s'),
+    Command(ModemDefs.CMD_GETJOINEUI,          '',         '8s'),
+    Command(ModemDefs.CMD_SETJOINEUI,          '8s'),
+    Command(ModemDefs.CMD_GETDEVEUI,           '',         '8s'),
+    Command(ModemDefs.CMD_SETDEVEUI,           '8s'),
+    Command(ModemDefs.CMD_SETNWKKEY,           '16s'),
+    Command(ModemDefs.CMD_GETCLASS,            '',         'B'),
+    Command(ModemDefs.CMD_SETCLASS,            'B'),
+    Command(ModemDefs.CMD_SETMULTICAST,        'I16s16sI'),
+    Command(ModemDefs.CMD_GETREGION,           '',         'B'),
+    Command(ModemDefs.CMD_SETREGION,           'B'),
+    Command(ModemDefs.CMD_LISTREGIONS,         '',         '*'),
+    Command(ModemDefs.CMD_GETADRPROFILE,       '',         'B'),
+    Command(ModemDefs.CMD_SETADRPROFILE,       'B*'),
+    Command(ModemDefs.CMD_GETDMPORT,           '',         'B'),
+    Command(ModemDefs.CMD_SETDMPORT,           'B'),
+    Command(ModemDefs.CMD_GETDMINFOINTERVAL,   '',         'B'),
+    Command(ModemDefs.CMD_SETDMINFOINTERVAL,   'B'),
+    Command(ModemDefs.CMD_GETDMINFOFIELDS,     '',         '*'),
+    Command(ModemDefs.CMD_SETDMINFOFIELDS,     '*'),
+    Command(ModemDefs.CMD_SENDDMSTATUS,        '*'),
+    Command(ModemDefs.CMD_SETAPPSTATUS,        '8s'),
+    Command(ModemDefs.CMD_JOIN),
+    Command(ModemDefs.CMD_LEAVENETWORK),
+    Command(ModemDefs.CMD_SUSPENDMODEMCOMM,    '?'),
+    Command(ModemDefs.CMD_GETNEXTTXMAXPAYLOAD, '',         'B'),
+    Command(ModemDefs.CMD_REQUESTTX,           'B?*'),
+    Command(ModemDefs.CMD_EMERGENCYTX,         'B?*'),
+    Command(ModemDefs.CMD_UPLOADINIT,          'B?HH'),
+    Command(ModemDefs.CMD_UPLOADDATA,          '*'),
+    Command(ModemDefs.CMD_UPLOADSTART,         'I'),
+    Command(ModemDefs.CMD_STREAMINIT,          'B?'),
+    Command(ModemDefs.CMD_SENDSTREAMDATA,      'B*'),
+    Command(ModemDefs.CMD_STREAMSTATUS,        'B',        'HH'),
+    Command(ModemDefs.CMD_GETBUDHAMODE,        '',         '*'),
+    Command(ModemDefs.CMD_SETBUDHAMODE,        '*'),
+    Command(ModemDefs.CMD_GETBUDHACONF,        '',         '*'),
+    Command(ModemDefs.CMD_SETBUDHACONF,        '*'),
+    Command(ModemDefs.CMD_GETDEVICEINFO,       '',         '*'),
+    Command(ModemDefs.CMD_SETDEVICEINFO,       '*'),
+] }
+
+
+# read-only commands of similar response latency, by command class (measured by calibrate.py)
+CLASSES = {
+    'status':  [ModemDefs.CMD_GETSTATUS, ModemDefs.CMD_GETTXPOWEROFFSET, ModemDefs.CMD_GETREGION],
+    'counter': [ModemDefs.CMD_GETCHARGE, ModemDefs.CMD_GETTIME],
+    'ident':   [ModemDefs.CMD_GETVERSION, ModemDefs.CMD_GETCHIPEUI, ModemDefs.CMD_GETDEVEUI],
+    'list':    [ModemDefs.CMD_LISTREGIONS, ModemDefs.CMD_GETDMINFOFIELDS],
+}
+CLASSOF = { cmd:name for name, cmds in CLASSES.items() for cmd in cmds }
+
+
+class Timing:
+    """
+    Serial link timing of a modem connection. The defaults are safe for all adapters,
+    calibrate.py measures an adapter and stores a tighter profile under its serial number.
+
+    timeout:            response timeout of commands without a measured class [s]
+    timeouts:           response timeout per command class [s]
+    inter_byte_timeout: maximum gap between response bytes [s]
+    busy_timeout:       maximum time for BUSY to go low after asserting COMMAND [s]
+    write_delay:        time to keep COMMAND asserted after writing a packet [s]
+    byte_time:          additional COMMAND time per packet byte [s]
+    """
+
+    PATH = os.path.expanduser('~/.modem_timing.json')
+
+    def __init__(self, timeout=1, inter_byte_timeout=0.010, busy_timeout=0.010, write_delay=0.025, byte_time=0.0, measured=None,
+                 timeouts=None):
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.inter_byte_timeout = inter_byte_timeout
+        self.busy_timeout = busy_timeout
+        self.write_delay = write_delay
+        self.byte_time = byte_time
+        self.measured = measured or {}
+
+    def __str__(self):
+        return ('timeout=%.1fms %sinter_byte_timeout=%.1fms busy_timeout=%.1fms write_delay=%.1fms byte_time=%.1fus' %
+                (self.timeout*1e3, ''.join('%s=%.1fms ' % (n, t*1e3) for n, t in self.timeouts.items()),
+                 self.inter_byte_timeout*1e3, self.busy_timeout*1e3, self.write_delay*1e3, self.byte_time*1e6))
+
+    # response timeout of command
+    def timeout_for(self, cmd:int) -> float:
+        return self.timeouts.get(CLASSOF.get(cmd), self.timeout)
+
+    # load profile of adapter from profile file (defaults if none stored or unusable)
+    @staticmethod
+    def load(serial_number:Optional[str], path:Optional[str]=None) -> 'Timing':
+        path = path or Timing.PATH
+        try:
+            with open(path) as f:
+                profiles = json.load(f)
+            return Timing(**profiles[serial_number]) if serial_number in profiles else Timing()
+        except FileNotFoundError:
+            return Timing()
+        except (ValueError, TypeError) as ex:
+            print('Timing: cannot load profile from %s, using defaults: %s' % (path, ex))
+            return Timing()
+
+    # store profile of adapter in profile file
+    def save(self, serial_number:str, path:Optional[str]=None):
+        path = path or Timing.PATH
+        try:
+            with open(path) as f:
+                profiles = json.load(f)
+        except FileNotFoundError:
+            profiles = {}
+        except ValueError:
+            print('Timing: %s is corrupt, replacing it' % path)
+            profiles = {}
+        profiles[serial_number] = vars(self)
+        with open(path, 'w') as f:
+            json.dump(profiles, f, indent=2)
+
+
 class Event:
     def __init__(self, ev:Tuple):
         self.type = ev[0]
@@ -100,20 +319,27 @@ class Modem:
 
     @staticmethod
     def lrc(buf:bytes) -> int:
-        lrc = 0
-        for x in buf:
-            lrc ^= x
-        return lrc
+        return lrc(buf)
 
     @staticmethod
     def make_packet(cmd:int, payload:bytes=b'') -> bytes:
         # command: CMD[1] LEN[1] DATA[...] LRC[1]
-        pkt = bytes([cmd, len(payload)]) + payload
-        return pkt + bytes([Modem.lrc(pkt)])
+        return b''.join((bytes((cmd, len(payload))), payload, LRCBYTES[cmd ^ len(payload) ^ lrc(payload)]))
 
-    def __init__(self, port:str='/dev/ttyUSB0'):
+    # return USB serial number of adapter at port (None if not available)
+    @staticmethod
+    def adapter_serial(port:str) -> Optional[str]:
+        dev = os.path.realpath(port)
+        for p in list_ports.comports():
+            if p.device == port or os.path.realpath(p.device) == dev:
+                return p.serial_number
+        return None
+
+    def __init__(self, port:str='/dev/ttyUSB0', timing:Optional[Timing]=None):
+        # timing profile stored for this adapter unless given
+        self.timing = timing or Timing.load(Modem.adapter_serial(port))
         # open modem interface (open after setting rts)
-        self.ser = Serial(baudrate=115200, timeout=1, inter_byte_timeout=0.010, rtscts=True)
+        self.ser = Serial(baudrate=115200, timeout=self.timing.timeout, inter_byte_timeout=self.timing.inter_byte_timeout, rtscts=True)
         self.ser.port = port
         self.ser.rts = 0
         self.ser.open()
@@ -148,30 +374,35 @@ class Modem:
     def send_packet(self, pkt):
         # assert COMMAND line (active-low)
         self.ser.rts = True
-        # wait until BUSY goes low (active-high, max 10ms)
+        # wait until BUSY goes low (active-high, max busy_timeout)
         t0 = time.time()
         while self.ser.cts == False:
-            assert (time.time() - t0 < 0.010), "timeout waiting for BUSY line going low"
+            assert (time.time() - t0 < self.timing.busy_timeout), "timeout waiting for BUSY line going low"
         # send packet
         self.ser.write(pkt)
         # (ser.flush() not working)
-        time.sleep(0.025)
+        time.sleep(self.timing.write_delay + len(pkt) * self.timing.byte_time)
         # de-assert COMMAND line
         self.ser.rts = False
 
+    # set response timeout for command (reconfigures the port only on change)
+    def set_timeout(self, cmd:int):
+        timeout = self.timing.timeout_for(cmd)
+        if self.ser.timeout != timeout:
+            self.ser.timeout = timeout
+
     # response: RC[1] LEN[1] DATA[...] LRC[1] --> (rc, data)
     def read_packet(self) -> Optional[Tuple]:
-        buf = bytearray()
-        while len(buf) < 3 or len(buf) < 3 + buf[1]:
-            b = self.ser.read()
-            if len(b) != 1:
-                break
-            buf += b
+        # header within timeout, rest of packet in one read bounded by inter_byte_timeout
+        buf = self.ser.read(2)
+        if len(buf) == 2:
+            buf += self.ser.read(buf[1] + 1)
         return (buf[0], bytes(buf[2:-1])) if len(buf) >= 3 and len(buf) == 3 + buf[1] and Modem.lrc(buf) == 0 else None
 
     # send command / receive response
     def command(self, cmd:int, payload:bytes=b'') -> bytes:
         # send command packet
+        self.set_timeout(cmd)
         self.send_packet(Modem.make_packet(cmd, payload))
         # read response packet
         rsp = self.read_packet()
@@ -182,195 +413,193 @@ class Modem:
             raise CommandError(rsp[0])
         return rsp[1] # -> data
 
+    # send command with arguments encoded according to COMMANDS table, return decoded response
+    def call(self, cmd:int, *args):
+        desc = COMMANDS[cmd]
+        self.set_timeout(cmd)
+        self.send_packet(desc.encode(args))
+        rsp = self.read_packet()
+        if not rsp:
+            raise CommandError(ModemDefs.RC_FRAMEERROR)
+        if rsp[0] != ModemDefs.RC_OK:
+            raise CommandError(rsp[0])
+        return desc.decode(rsp[1])
+
+    # execute sequence of (cmd, args...) tuples, return list of decoded responses
+    def batch(self, cmds:List[Tuple]) -> List:
+        return [self.call(*c) for c in cmds]
+
     # modem commands...
 
     def getversion(self) -> Tuple:
-        data = self.command(ModemDefs.CMD_GETVERSION)
-        return unpack('>IIH', data) # -> (bl, fw, lw)
+        return self.call(ModemDefs.CMD_GETVERSION) # -> (bl, fw, lw)
 
     def getpin(self) -> bytes:
-        pin = self.command(ModemDefs.CMD_GETPIN)
-        return pin
+        return self.call(ModemDefs.CMD_GETPIN)
 
     def getchipeui(self) -> bytes:
-        chipeui = self.command(ModemDefs.CMD_GETCHIPEUI)
-        return chipeui
+        return self.call(ModemDefs.CMD_GETCHIPEUI)
 
     def getdeveui(self) -> bytes:
-        deveui = self.command(ModemDefs.CMD_GETDEVEUI)
-        return deveui
+        return self.call(ModemDefs.CMD_GETDEVEUI)
 
     def setdeveui(self, eui:bytes):
         if not isinstance(eui, bytes) or len(eui) != 8:
             raise ValueError('deveui must be 8 bytes')
-        self.command(ModemDefs.CMD_SETDEVEUI, eui)
+        self.call(ModemDefs.CMD_SETDEVEUI, eui)
 
     def getjoineui(self) -> bytes:
-        joineui = self.command(ModemDefs.CMD_GETJOINEUI)
-        return joineui
+        return self.call(ModemDefs.CMD_GETJOINEUI)
 
     def setjoineui(self, joineui:bytes):
         if not isinstance(joineui, bytes) or len(joineui) != 8:
             raise ValueError('joineui must be 8 bytes')
-        self.command(ModemDefs.CMD_SETJOINEUI, joineui)
+        self.call(ModemDefs.CMD_SETJOINEUI, joineui)
 
     def setnwkkey(self, key:bytes):
         if not isinstance(key, bytes) or len(key) != 16:
             raise ValueError('nwkkey must be 16 bytes')
-        self.command(ModemDefs.CMD_SETNWKKEY, key)
+        self.call(ModemDefs.CMD_SETNWKKEY, key)
 
     def getregion(self) -> int:
-        region = self.command(ModemDefs.CMD_GETREGION)
-        return region[0]
+        return self.call(ModemDefs.CMD_GETREGION)
 
     def setregion(self, regcode:int):
-        self.command(ModemDefs.CMD_SETREGION, bytes([regcode]))
+        self.call(ModemDefs.CMD_SETREGION, regcode)
 
     def listregions(self) -> Tuple:
-        regions = self.command(ModemDefs.CMD_LISTREGIONS)
-        return unpack('B' * len(regions), regions)
+        return tuple(self.call(ModemDefs.CMD_LISTREGIONS))
 
     def gettxpowoff(self) -> int:
-        txpowoff = self.command(ModemDefs.CMD_GETTXPOWEROFFSET)
-        return unpack('b', txpowoff)[0]
+        return self.call(ModemDefs.CMD_GETTXPOWEROFFSET)
 
     def settxpowoff(self, off:int):
-        self.command(ModemDefs.CMD_SETTXPOWEROFFSET, pack('b', off))
+        self.call(ModemDefs.CMD_SETTXPOWEROFFSET, off)
 
     def getprofile(self) -> int:
-        profile = self.command(ModemDefs.CMD_GETADRPROFILE)
-        return profile[0]
+        return self.call(ModemDefs.CMD_GETADRPROFILE)
 
     def setprofile(self, pro:int, custom=b''):
         if not ((pro >= 0 and pro < 3 and len(custom) == 0) or (pro == 3 and len(custom) == 16)):
             raise ValueError('profile must be 0-2 without data, or 3 with 16 bytes custom data rates')
-        self.command(ModemDefs.CMD_SETADRPROFILE, bytes([pro]) + custom)
+        self.call(ModemDefs.CMD_SETADRPROFILE, pro, custom)
 
     def getinterval(self) -> int:
-        data = self.command(ModemDefs.CMD_GETDMINFOINTERVAL)
-        return (data[0] & 0x3F) * ((1, 60*60*24, 60*60, 60)[data[0] >> 6])
+        val = self.call(ModemDefs.CMD_GETDMINFOINTERVAL)
+        return (val & 0x3F) * ((1, 60*60*24, 60*60, 60)[val >> 6])
 
     def setinterval(self, val:int, unit='s'):
         if val > 63:
             raise ValueError('value out of range 0-63: ' + str(val))
-        self.command(ModemDefs.CMD_SETDMINFOINTERVAL, bytes([((ord(unit) << 4) & 0xC0) | val]))
+        self.call(ModemDefs.CMD_SETDMINFOINTERVAL, ((ord(unit) << 4) & 0xC0) | val)
 
     def getdmport(self) -> int:
-        dmport = self.command(ModemDefs.CMD_GETDMPORT)
-        return dmport[0]
+        return self.call(ModemDefs.CMD_GETDMPORT)
 
     def setdmport(self, port:int):
-        self.command(ModemDefs.CMD_SETDMPORT, bytes([port]))
+        self.call(ModemDefs.CMD_SETDMPORT, port)
 
     def getdmfields(self) -> Tuple:
-        fields = self.command(ModemDefs.CMD_GETDMINFOFIELDS)
-        return unpack('B' * len(fields), fields)
+        return tuple(self.call(ModemDefs.CMD_GETDMINFOFIELDS))
 
     def setdmfields(self, fields:bytes):
-        self.command(ModemDefs.CMD_SETDMINFOFIELDS, fields)
+        self.call(ModemDefs.CMD_SETDMINFOFIELDS, fields)
 
     def gettrace(self):
-        trace = self.command(ModemDefs.CMD_GETTRACE)
+        trace = self.call(ModemDefs.CMD_GETTRACE)
         return trace if len(trace) > 0 else None
 
     def getstatus(self) -> int:
-        data = self.command(ModemDefs.CMD_GETSTATUS)
-        return data[0]
+        return self.call(ModemDefs.CMD_GETSTATUS)
 
     def getevent(self):
-        data = self.command(ModemDefs.CMD_GETEVENT)
+        data = self.call(ModemDefs.CMD_GETEVENT)
         return (Event((data[0], data[1], data[2:])) if len(data) > 0 else None) # -> (evtype, cnt, data)
 
     def getcharge(self) -> int:
-        charge = self.command(ModemDefs.CMD_GETCHARGE)
-        return unpack('>I', charge)[0] # -> mAh
+        return self.call(ModemDefs.CMD_GETCHARGE) # -> mAh
 
     def reset(self):
-        self.command(ModemDefs.CMD_RESET)
+        self.call(ModemDefs.CMD_RESET)
 
     def factory(self):
-        self.command(ModemDefs.CMD_FACTORYRESET)
+        self.call(ModemDefs.CMD_FACTORYRESET)
 
     def resetcharge(self):
-        self.command(ModemDefs.CMD_RESETCHARGE)
+        self.call(ModemDefs.CMD_RESETCHARGE)
 
     def setalarm(self, seconds:int):
-        self.command(ModemDefs.CMD_SETALARM, pack('>I', seconds))
+        self.call(ModemDefs.CMD_SETALARMTIMER, seconds)
 
     def firmwareupdate(self, blockno, blockcnt, blockdata):
         if blockno >= blockcnt:
             raise ValueError('blockno must be less than blockcnt')
         if len(blockdata) > 128 or (blockno != blockcnt-1 and len(blockdata) != 128):
             raise ValueError('size of blockdata must be 128 for all but the last block')
-        self.command(ModemDefs.CMD_FIRMWAREUPDATE, pack('>HH', blockno, blockcnt) + blockdata)
+        self.call(ModemDefs.CMD_FIRMWAREUPDATE, blockno, blockcnt, blockdata)
 
     def join(self):
-        self.command(ModemDefs.CMD_JOIN)
+        self.call(ModemDefs.CMD_JOIN)
 
     def leave(self):
-        self.command(ModemDefs.CMD_LEAVENETWORK)
+        self.call(ModemDefs.CMD_LEAVENETWORK)
 
     def suspend(self, susp:bool):
-        self.command(ModemDefs.CMD_SUSPENDMODEMCOMM, bytes([0x01 if susp else 0x00]))
+        self.call(ModemDefs.CMD_SUSPENDMODEMCOMM, susp)
 
     def maxpayload(self) -> int:
-        size = self.command(ModemDefs.CMD_GETNEXTTXMAXPAYLOAD)
-        return size[0]
+        return self.call(ModemDefs.CMD_GETNEXTTXMAXPAYLOAD)
 
     def requesttx(self, port:int, payload:bytes, confirmed=False):
-        self.command(ModemDefs.CMD_REQUESTTX, bytes([port, 0x01 if confirmed else 0x00]) + payload)
+        self.call(ModemDefs.CMD_REQUESTTX, port, confirmed, payload)
 
     def emergencytx(self, port:int, payload:bytes, confirmed=False):
-        self.command(ModemDefs.CMD_EMERGENCYTX, bytes([port, 0x01 if confirmed else 0x00]) + payload)
+        self.call(ModemDefs.CMD_EMERGENCYTX, port, confirmed, payload)
 
     def gettime(self) -> int:
-        seconds = self.command(ModemDefs.CMD_GETTIME)
-        return unpack('>I', seconds)[0]
+        return self.call(ModemDefs.CMD_GETTIME)
 
     def getclass(self) -> int:
-        cls = self.command(ModemDefs.CMD_GETCLASS)
-        return cls[0]
+        return self.call(ModemDefs.CMD_GETCLASS)
 
     def setclass(self, cl:int):
-        self.command(ModemDefs.CMD_SETCLASS, bytes([cl]))
+        self.call(ModemDefs.CMD_SETCLASS, cl)
 
     def setmulticast(self, grpaddr, nwkkeydn, appkey, seqnoadn):
         if not (isinstance(nwkkeydn, bytes) and len(nwkkeydn) == 16 and isinstance(appkey, bytes) and len(appkey) == 16):
             raise ValueError('session keys must be 16 bytes')
-        self.command(ModemDefs.CMD_SETMULTICAST, pack('>I', grpaddr) + nwkkeydn + appkey + pack('>I', seqnoadn))
+        self.call(ModemDefs.CMD_SETMULTICAST, grpaddr, nwkkeydn, appkey, seqnoadn)
 
     def uploadinit(self, port:int, enc:bool, size:int, delay:int):
-        self.command(ModemDefs.CMD_UPLOADINIT, pack('>BBHH', port, 0x01 if enc else 0x00, size, delay))
+        self.call(ModemDefs.CMD_UPLOADINIT, port, enc, size, delay)
 
     def uploaddata(self, data:bytes):
-        self.command(ModemDefs.CMD_UPLOADDATA, data)
+        self.call(ModemDefs.CMD_UPLOADDATA, data)
 
     def uploadstart(self, crc:int):
-        self.command(ModemDefs.CMD_UPLOADSTART, pack('>I', crc))
+        self.call(ModemDefs.CMD_UPLOADSTART, crc)
 
     def senddmstatus(self, fields:bytes):
-        self.command(ModemDefs.CMD_SENDDMSTATUS, fields)
+        self.call(ModemDefs.CMD_SENDDMSTATUS, fields)
 
     def setappstatus(self, status:bytes):
         if not isinstance(status, bytes) or len(status) != 8:
             raise ValueError('appstatus must be 8 bytes')
-        self.command(ModemDefs.CMD_SETAPPSTATUS, status)
+        self.call(ModemDefs.CMD_SETAPPSTATUS, status)
 
     def streaminit(self, port:int, enc:bool):
-        self.command(ModemDefs.CMD_STREAMINIT, bytes([port, 0x01 if enc else 0x00]))
+        self.call(ModemDefs.CMD_STREAMINIT, port, enc)
 
     def streamdata(self, port:int, record:bytes):
-        self.command(ModemDefs.CMD_SENDSTREAMDATA, bytes([port]) + record)
+        self.call(ModemDefs.CMD_SENDSTREAMDATA, port, record)
 
     def streamstatus(self, port:int) -> Tuple:
-        stat = self.command(ModemDefs.CMD_STREAMSTATUS, bytes([port]))
-        return unpack('>HH', stat) # -> (pending, free)
+        return self.call(ModemDefs.CMD_STREAMSTATUS, port) # -> (pending, free)
 
     # convenience methods...
 
     def tx(self, port:int, payload:bytes, emergency=False, confirmed=False):
-        self.command(ModemDefs.CMD_EMERGENCYTX if emergency else ModemDefs.CMD_REQUESTTX,
-                     bytes([port, 0x01 if confirmed else 0x00]) + payload)
+        self.call(ModemDefs.CMD_EMERGENCYTX if emergency else ModemDefs.CMD_REQUESTTX, port, confirmed, payload)
 
     def update(self, data):
         data = Modem.getbytes(data)
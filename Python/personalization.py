@@ -2,22 +2,191 @@
 Copyright (C) Gonzalo Casas 2020
 Distributed under the MIT License (license terms are at http://opensource.org/licenses/MIT).
 
-Run it only once during comissioning, keys are persistent. 
+Run it only once during comissioning, keys are persistent.
+
+Bulk provisioning of modems from a manifest of device credentials.
+The manifest is a CSV file with a header row or a JSON list of objects,
+with the columns deveui, appeui (or joineui), appkey and optionally
+chipeui. Entries with a chipeui are only written to the matching modem,
+entries without one are handed out to the remaining modems in order.
+
+All serial ports given on the command line are provisioned concurrently.
+Every provisioned device is appended to a journal file, so a batch that
+gets interrupted can simply be re-run and resumes where it stopped.
+
+  $ python personalization.py devices.csv /dev/ttyUSB0 /dev/ttyUSB1 ...
 """
+from typing import Dict, List, Optional
+
 import sys
+import csv
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
 from modem import Modem
 
-DEVEUI = 'REPLACEME'
-APPEUI = "REPLACEME"
-APPKEY = "REPLACEME"
 
-ser_port = sys.argv[1] if len(sys.argv) == 2 else '/dev/ttyUSB0'
+def hexstr(s:str) -> str:
+    return s.replace('-', '').replace(':', '').strip().upper()
+
+
+def load_manifest(path:str) -> List[Dict]:
+    with open(path, newline='') as f:
+        if path.lower().endswith('.json'):
+            rows = json.load(f)
+            first = 1
+        else:
+            rows = list(csv.DictReader(f))
+            first = 2   # line number of first data row, after header
+    entries = []
+    chipeuis = set()
+    deveuis = set()
+    for n, row in enumerate(rows, first):
+        # surplus CSV fields end up under key None
+        row = { k.strip().lower():v for k,v in row.items() if k is not None and v }
+        missing = [k for k in ('deveui', 'appkey') if k not in row] + ([] if 'joineui' in row or 'appeui' in row else ['appeui'])
+        if missing:
+            raise ValueError('manifest entry %d: missing %s' % (n, ', '.join(missing)))
+        entry = {
+            'deveui':  hexstr(row['deveui']),
+            'joineui': hexstr(row.get('joineui', row.get('appeui'))),
+            'appkey':  hexstr(row['appkey']),
+            'chipeui': hexstr(row.get('chipeui', '')),
+        }
+        # check all fields before anything is written to a modem
+        sizes = { 'deveui': 8, 'joineui': 8, 'appkey': 16, 'chipeui': 8 if entry['chipeui'] else 0 }
+        try:
+            if any(len(entry[k]) != 2*size or len(bytes.fromhex(entry[k])) != size for k, size in sizes.items()):
+                raise ValueError()
+        except ValueError:
+            raise ValueError('manifest entry %d: invalid credentials for deveui %s' % (n, entry['deveui'])) from None
+        if entry['deveui'] in deveuis:
+            raise ValueError('manifest entry %d: duplicate deveui %s' % (n, entry['deveui']))
+        if entry['chipeui'] and entry['chipeui'] in chipeuis:
+            raise ValueError('manifest entry %d: duplicate chipeui %s' % (n, entry['chipeui']))
+        deveuis.add(entry['deveui'])
+        chipeuis.add(entry['chipeui'])
+        entries.append(entry)
+    return entries
+
+
+class Journal:
+    """
+    Append-only record (one JSON object per line) of provisioned devices.
+    """
+    def __init__(self, path:str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.chipeuis = set()
+        self.deveuis = set()
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # records are written with a single write ending in a newline, so only the text
+        # after the last newline can be partly written (run killed during add)
+        lines = data.split(b'\n')
+        tail = lines.pop()
+        for line in lines:
+            if line.strip():
+                self._load(json.loads(line))
+        if tail.strip():
+            try:
+                self._load(json.loads(tail))
+                with open(path, 'a') as f:
+                    f.write('\n')
+            except ValueError:
+                print('Journal: skipping partly written last line of %s' % path)
+                with open(path, 'r+b') as f:
+                    f.truncate(len(data) - len(tail))
+
+    def _load(self, rec:Dict):
+        self.chipeuis.add(rec['chipeui'])
+        self.deveuis.add(rec['deveui'])
+
+    def add(self, chipeui:str, deveui:str, port:str):
+        rec = { 'chipeui': chipeui, 'deveui': deveui, 'port': port,
+                'time': datetime.now().isoformat(timespec='seconds') }
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(rec) + '\n')
+                f.flush()
+            self.chipeuis.add(chipeui)
+            self.deveuis.add(deveui)
+
+
+class Provisioner:
+    def __init__(self, manifest:List[Dict], journal:Journal):
+        self.journal = journal
+        self.lock = threading.Lock()
+        # pending entries, split into pinned (by chipeui) and free ones
+        pending = [e for e in manifest if e['deveui'] not in journal.deveuis]
+        self.pinned = { e['chipeui']:e for e in pending if e['chipeui'] }
+        self.free = [e for e in pending if not e['chipeui']]
+
+    def claim(self, chipeui:str) -> Optional[Dict]:
+        with self.lock:
+            if chipeui in self.pinned:
+                return self.pinned.pop(chipeui)
+            return self.free.pop(0) if self.free else None
+
+    def release(self, entry:Dict):
+        with self.lock:
+            if entry['chipeui']:
+                self.pinned[entry['chipeui']] = entry
+            else:
+                self.free.insert(0, entry)
+
+    def provision(self, ser_port:str) -> str:
+        m = Modem(ser_port)
+        try:
+            chipeui = m.chipeui.hex().upper()
+            if chipeui in self.journal.chipeuis:
+                return 'already provisioned'
+            entry = self.claim(chipeui)
+            if entry is None:
+                return 'no manifest entry left'
+            try:
+                m.setdeveui(bytes.fromhex(entry['deveui']))
+                m.setjoineui(bytes.fromhex(entry['joineui']))
+                m.setnwkkey(bytes.fromhex(entry['appkey']))
+                # nwkkey is write-only and deveui/joineui have no combined read command,
+                # so these two reads are the minimum verification
+                if m.deveui.hex().upper() != entry['deveui'] or m.joineui.hex().upper() != entry['joineui']:
+                    raise RuntimeError('verification failed')
+            except Exception:
+                self.release(entry)
+                raise
+            self.journal.add(chipeui, entry['deveui'], ser_port)
+            return 'chipeui=%s deveui=%s' % (chipeui, entry['deveui'])
+        finally:
+            m.ser.close()
+
+    def run(self, ser_ports:List[str]) -> Dict:
+        def work(ser_port):
+            try:
+                return self.provision(ser_port)
+            except Exception as ex:
+                return 'FAILED: %s' % ex
+        with ThreadPoolExecutor(max_workers=len(ser_ports)) as pool:
+            return dict(zip(ser_ports, pool.map(work, ser_ports)))
 
-m = Modem(ser_port)
 
-m.setdeveui(bytes(bytearray.fromhex(DEVEUI)))
-m.setjoineui(bytes(bytearray.fromhex(APPEUI)))
-m.setnwkkey(bytes(bytearray.fromhex(APPKEY)))
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Provision modems from a credentials manifest.')
+    parser.add_argument('manifest', help='CSV or JSON file with deveui, appeui, appkey [, chipeui]')
+    parser.add_argument('ports', nargs='*', default=['/dev/ttyUSB0'], help='serial ports of the modems')
+    parser.add_argument('--journal', help='journal file (default: <manifest>.journal)')
+    args = parser.parse_args()
 
-assert m.euistr(m.deveui).replace('-','') == DEVEUI
-assert m.euistr(m.joineui).replace('-','') == APPEUI 
+    journal = Journal(args.journal or args.manifest + '.journal')
+    prov = Provisioner(load_manifest(args.manifest), journal)
+    results = prov.run(args.ports)
+    for ser_port, result in results.items():
+        print('%s: %s' % (ser_port, result))
+    print('%d devices provisioned, %d manifest entries left' % (len(journal.deveuis), len(prov.pinned) + len(prov.free)))
+    sys.exit(1 if any(r.startswith('FAILED') for r in results.values()) else 0)
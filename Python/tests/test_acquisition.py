@@ -0,0 +1,61 @@
+import threading
+import time
+
+from acquisition import Acquisition, RingBuffer, Source
+
+
+def test_ring_drain_order():
+    r = RingBuffer(4)
+    assert r.drain() == ([], 0)
+    for x in range(3):
+        r.push(x)
+    assert len(r) == 3
+    assert r.drain() == ([0.0, 1.0, 2.0], 0)
+    # wraps around the end of the buffer
+    for x in range(3, 6):
+        r.push(x)
+    assert r.drain() == ([3.0, 4.0, 5.0], 0)
+    assert len(r) == 0
+
+
+def test_ring_overflow():
+    r = RingBuffer(4)
+    for x in range(7):
+        r.push(x)
+    assert r.drain() == ([3.0, 4.0, 5.0, 6.0], 3)
+    r.push(7)
+    assert r.drain() == ([7.0], 0)
+    for x in range(6):
+        r.push(x)
+    assert r.drain() == ([2.0, 3.0, 4.0, 5.0], 2)
+    assert r.overflows == 5
+
+
+def test_collect():
+    src = Source('t', lambda: 0.0, size=3)
+    acq = Acquisition([src, Source('empty', lambda: 0.0)])
+    for x in (20.0, 21.0, 22.0, 24.0):
+        src.ring.push(x)
+    assert acq.collect() == { 't': { 'n': 3, 'min': 21.0, 'mean': 67.0 / 3, 'max': 24.0, 'overflows': 1 }, 'empty': None }
+    assert acq.collect() == { 't': None, 'empty': None }
+    assert acq.overflows == { 't': 1, 'empty': 0 }
+
+
+def test_slow_source_does_not_delay_others():
+    blocked = threading.Event()
+    def slow():
+        blocked.wait(1)
+        return 0.0
+    def failing():
+        raise IOError('no sensor')
+    fast = Source('fast', lambda: 1.0, period=0.01)
+    bad = Source('bad', failing, period=0.01)
+    acq = Acquisition([Source('slow', slow, period=0.01), fast, bad])
+    acq.start()
+    time.sleep(0.2)
+    blocked.set()
+    acq.stop()
+    window = acq.collect()
+    assert window['fast']['n'] >= 5
+    assert window['slow']['n'] <= 2
+    assert window['bad'] is None and bad.errors >= 5
@@ -0,0 +1,86 @@
+import random
+
+import modemdefs as ModemDefs
+from adr import LinkController
+from modem import CommandError, Event
+
+
+class FakeModem:
+    def __init__(self, profile=ModemDefs.ADRP_LOWPOWER, txpowoff=-2):
+        self.profile = profile
+        self.txpowoff = txpowoff
+        self.fail = False
+
+    def getprofile(self):
+        return self.profile
+
+    def gettxpowoff(self):
+        return self.txpowoff
+
+    def setprofile(self, pro, custom=b''):
+        if self.fail:
+            raise CommandError(ModemDefs.RC_FAIL)
+        self.profile = pro
+
+    def settxpowoff(self, off):
+        self.txpowoff = off
+
+
+CONFIRMED = Event((ModemDefs.EVT_TXDONE, 0, b'\x02'))
+SENT = Event((ModemDefs.EVT_TXDONE, 0, b'\x01'))
+
+
+def test_starts_from_current_setting():
+    m = FakeModem()
+    lc = LinkController(m)
+    assert lc.step == 2
+    assert (m.profile, m.txpowoff) == (ModemDefs.ADRP_LOWPOWER, -2)
+    assert LinkController(FakeModem(ModemDefs.ADRP_NETWORK, 0)).step == 0
+
+
+def test_confirmed_delivery_steps_without_downlinks():
+    m = FakeModem(ModemDefs.ADRP_LONGRANGE, 0)
+    lc = LinkController(m, window=4, min_samples=4)
+    for _ in range(4):
+        lc.event(SENT)
+    assert lc.step == 0
+    for _ in range(4):
+        lc.event(CONFIRMED)
+    assert lc.step == 1
+    assert (m.profile, m.txpowoff) == (ModemDefs.ADRP_LOWPOWER, 0)
+
+
+def test_failed_apply_is_logged_and_keeps_step():
+    m = FakeModem(ModemDefs.ADRP_LOWPOWER, 0)
+    lc = LinkController(m, min_samples=4)
+    m.fail = True
+    for _ in range(2):
+        lc.event(SENT)
+    assert lc.step == 1
+    assert lc.decisions[-1]['step'] == 0 and lc.decisions[-1]['error']
+    m.fail = False
+    lc.event(SENT)
+    assert lc.step == 0 and lc.decisions[-1]['error'] is None
+    assert m.profile == ModemDefs.ADRP_LONGRANGE
+
+
+def test_dry_run():
+    m = FakeModem(ModemDefs.ADRP_LONGRANGE, 0)
+    lc = LinkController(m, min_samples=2, dry_run=True)
+    lc.event(CONFIRMED)
+    lc.event(CONFIRMED)
+    assert lc.step == 1
+    assert m.profile == ModemDefs.ADRP_LONGRANGE
+
+
+def test_lossy_step_is_held_off():
+    rnd = random.Random(1)
+    m = FakeModem(ModemDefs.ADRP_LONGRANGE, 0)
+    lc = LinkController(m, txpowoffs=(0,))
+    delivered = 0
+    for _ in range(10000):
+        ok = rnd.random() < (0.99 if lc.step == 0 else 0.5)
+        delivered += ok
+        lc.event(CONFIRMED if ok else SENT)
+    assert delivered / 10000 >= lc.target
+    assert len(lc.decisions) < 40
@@ -0,0 +1,77 @@
+from struct import pack
+
+import pytest
+
+import dmrecord
+import modemdefs as ModemDefs
+
+STATUS = bytes([ModemDefs.INF_STATUS, 0x08,
+                ModemDefs.INF_CHARGE]) + pack('<H', 123) + bytes([
+                ModemDefs.INF_VOLTAGE, 165,
+                ModemDefs.INF_TEMP]) + pack('<b', -5) + bytes([
+                ModemDefs.INF_SIGNAL, 4, 40,
+                ModemDefs.INF_INTERVAL, 0x80 | 5])
+CHIP = bytes([ModemDefs.INF_CHIPEUI]) + pack('<Q', 0x0102030405060708)
+CRASH = CHIP + bytes([ModemDefs.INF_CRASHLOG, 0x01, 0x00, 0x00])
+CRASH2 = CHIP + bytes([ModemDefs.INF_CRASHLOG, 0x02, 0x00])
+BAD = b'\x99\x00'
+TRUNCATED = STATUS[:3]
+
+
+def test_decode():
+    assert dmrecord.decode(STATUS) == {
+        'status': 8, 'charge': 123, 'voltage': 3.3, 'temp': -5,
+        'rssi': -60, 'snr': 10.0, 'interval': 5*60*60 }
+    assert dmrecord.decode(CRASH) == { 'chipeui': 0x0102030405060708, 'crashlog': b'\x01\x00\x00' }
+
+
+@pytest.mark.parametrize('payload', [BAD, TRUNCATED, b''])
+def test_decode_invalid(payload):
+    with pytest.raises(ValueError):
+        dmrecord.decode(payload)
+
+
+def test_same_length_different_layout():
+    # same length and first tag as STATUS, different fields after it
+    other = bytes([ModemDefs.INF_STATUS, 0x01, ModemDefs.INF_RSTCOUNT]) + pack('<H', 7) + bytes([ModemDefs.INF_UPTIME]) + pack('<H', 9) + \
+            bytes([ModemDefs.INF_RXTIME]) + pack('<H', 2) + bytes([ModemDefs.INF_SIGNAL, 4, 40])
+    assert len(other) == len(STATUS)
+    assert dmrecord.decode(STATUS)['charge'] == 123
+    assert dmrecord.decode(other) == { 'status': 1, 'rstcount': 7, 'uptime': 9, 'rxtime': 2, 'rssi': -60, 'snr': 10.0 }
+
+
+def batch(payloads, monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(dmrecord, 'np', None)
+    monkeypatch.setattr(dmrecord, '_plans', {})
+    cols, mask = dmrecord.decode_batch(payloads)
+    return { k: list(v) for k, v in cols.items() }, { k: [bool(x) for x in v] for k, v in mask.items() }
+
+
+PAYLOADS = [STATUS, CRASH, BAD, STATUS, CRASH2, b'', TRUNCATED, CRASH]
+
+
+def test_batch_fallback(monkeypatch):
+    cols, mask = batch(PAYLOADS, monkeypatch, numpy=False)
+    assert mask['status'] == [True, False, False, True, False, False, False, False]
+    assert cols['voltage'][:4] == [3.3, 0.0, 0.0, 3.3]
+    assert cols['interval'][0] == 5*60*60
+    assert mask['chipeui'] == [False, True, False, False, True, False, False, True]
+    assert cols['crashlog'] == [None, b'\x01\x00\x00', None, None, b'\x02\x00', None, None, b'\x01\x00\x00']
+    for name in dmrecord.COLUMNS:
+        for i, payload in enumerate(PAYLOADS):
+            if mask[name][i]:
+                assert cols[name][i] == pytest.approx(dmrecord.decode(payload)[name])
+
+
+def test_batch_numpy_parity(monkeypatch):
+    pytest.importorskip('numpy')
+    fb = batch(PAYLOADS, monkeypatch, numpy=False)
+    monkeypatch.undo()
+    assert dmrecord.np is not None
+    assert batch(PAYLOADS, monkeypatch, numpy=True) == fb
+
+
+def test_batch_columns():
+    cols, mask = dmrecord.decode_batch([STATUS], columns=['charge'])
+    assert list(cols) == ['charge'] and list(mask) == ['charge']
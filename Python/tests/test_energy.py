@@ -0,0 +1,86 @@
+import pytest
+
+import modemdefs as ModemDefs
+from energy import EnergyProfiler, Stats
+from modem import CommandError, Event
+
+
+class FakeModem:
+    def __init__(self):
+        self.charge = 0
+        self.fail = False
+
+    def getcharge(self):
+        if self.fail:
+            raise CommandError(ModemDefs.RC_FRAMEERROR)
+        return self.charge
+
+    def tx(self, port, payload, emergency=False, confirmed=False):
+        self.charge += len(payload)
+
+    def join(self):
+        self.charge += 3
+
+
+TXDONE = Event((ModemDefs.EVT_TXDONE, 0, b'\x01'))
+JOINED = Event((ModemDefs.EVT_JOINED, 0, b''))
+
+
+def test_estimate():
+    st = Stats()
+    assert st.estimate(10) == 0.0
+    st.add(4, 2, 1.0)
+    st.add(4, 4, 1.0)
+    assert st.estimate(100) == 3.0
+    st = Stats()
+    for size, charge in [(0, 1), (10, 3), (20, 5)]:
+        st.add(size, charge, 1.0)
+    assert st.estimate(30) == pytest.approx(7.0)
+    assert st.estimate(-100) == 0.0
+    assert (st.count, st.charge, st.size, st.duration) == (3, 9, 30, 3.0)
+
+
+def test_profile_and_lifetime():
+    m = FakeModem()
+    prof = EnergyProfiler(m)
+    prof.join()
+    prof.event(JOINED)
+    m.charge += 1   # idle
+    for size in (4, 8):
+        prof.tx(1, bytes(size))
+        assert prof.event(None) is None
+        prof.event(TXDONE)
+    assert prof.stats[('join', None)].charge == 3
+    tx = prof.stats[('tx', 1)]
+    assert (tx.count, tx.charge, tx.size) == (2, 12, 12)
+    assert prof.idle_charge == 1
+    prof.idle_time = 60*60
+    # 288 uplinks of 4 bytes (4 mAh each) plus 24 mAh idle per day
+    assert prof.lifetime(capacity=1200, period=300, size=4) == pytest.approx(1200 / (288*4 + 24))
+    with pytest.raises(ValueError):
+        prof.lifetime(capacity=1200, period=300, size=4, port=2)
+
+
+def test_lost_operation():
+    m = FakeModem()
+    prof = EnergyProfiler(m)
+    prof.tx(1, bytes(5))
+    prof.tx(1, bytes(2))
+    prof.event(TXDONE)
+    assert prof.stats[('tx-lost', 1)].charge == 5
+    assert prof.stats[('tx', 1)].charge == 2
+    assert prof.idle_charge == 0
+
+
+def test_charge_errors_do_not_propagate():
+    m = FakeModem()
+    prof = EnergyProfiler(m)
+    m.fail = True
+    prof.tx(1, bytes(5))
+    assert m.charge == 5
+    assert prof.event(TXDONE) is TXDONE
+    m.fail = False
+    prof.tx(1, bytes(5))
+    m.fail = True
+    assert prof.event(TXDONE) is TXDONE
+    assert prof.stats == {}
@@ -0,0 +1,196 @@
+import re
+from struct import pack
+
+import pytest
+
+import modem
+import modemdefs as ModemDefs
+from modem import COMMANDS, CommandError, Modem
+
+
+# packet encoding as originally hand-built: CMD[1] LEN[1] DATA[...] LRC[1]
+def reference_packet(cmd, payload=b''):
+    pkt = bytes([cmd, len(payload)]) + payload
+    lrc = 0
+    for x in pkt:
+        lrc ^= x
+    return pkt + bytes([lrc])
+
+
+SAMPLES = { 'B': 0xA5, 'b': -3, '?': True, 'H': 0x1234, 'I': 0x12345678 }
+
+def sample_args(fmt):
+    args = []
+    for count, c in re.findall(r'(\d*)([a-zA-Z?])', fmt.rstrip('*')):
+        args.append(bytes(range(int(count))) if c == 's' else SAMPLES[c])
+    if fmt.endswith('*'):
+        args.append(b'variable tail')
+    return args
+
+
+@pytest.mark.parametrize('cmd', sorted(COMMANDS), ids=lambda c: COMMANDS[c].name)
+def test_encode_matches_reference(cmd):
+    desc = COMMANDS[cmd]
+    fmt = desc.head.format[3:]
+    fmt += '*' if desc.req_var else ''
+    args = sample_args(fmt)
+    payload = pack('>' + fmt.rstrip('*'), *[a for a in args if not (desc.req_var and a is args[-1])])
+    if desc.req_var:
+        payload += args[-1]
+    assert desc.encode(tuple(args)) == reference_packet(cmd, payload)
+    assert Modem.make_packet(cmd, payload) == reference_packet(cmd, payload)
+
+
+@pytest.mark.parametrize('size', [0, 1, 63, 64, 65, 200, 255])
+def test_lrc(size):
+    data = bytes((x * 37 + 11) & 0xFF for x in range(size))
+    expected = 0
+    for x in data:
+        expected ^= x
+    assert modem.lrc(data) == expected
+    assert Modem.make_packet(0x2C, data) == reference_packet(0x2C, data)
+
+
+def test_encode_errors():
+    desc = COMMANDS[ModemDefs.CMD_UPLOADDATA]
+    with pytest.raises(ValueError):
+        desc.encode((bytes(300),))
+    assert desc.encode((b'ok',)) == reference_packet(ModemDefs.CMD_UPLOADDATA, b'ok')
+    with pytest.raises(TypeError):
+        COMMANDS[ModemDefs.CMD_SETDMPORT].encode(())
+    with pytest.raises(TypeError):
+        COMMANDS[ModemDefs.CMD_GETSTATUS].encode((1,))
+
+
+def test_decode():
+    assert COMMANDS[ModemDefs.CMD_GETVERSION].decode(pack('>IIH', 1, 2, 3)) == (1, 2, 3)
+    assert COMMANDS[ModemDefs.CMD_GETCHARGE].decode(pack('>I', 42)) == 42
+    assert COMMANDS[ModemDefs.CMD_GETEVENT].decode(b'') == b''
+    assert COMMANDS[ModemDefs.CMD_JOIN].decode(b'') is None
+
+
+@pytest.mark.parametrize('cmd, data', [
+    (ModemDefs.CMD_GETVERSION, bytes(9)),
+    (ModemDefs.CMD_GETVERSION, bytes(11)),
+    (ModemDefs.CMD_GETCHIPEUI, bytes(7)),
+    (ModemDefs.CMD_GETCHIPEUI, bytes(9)),
+    (ModemDefs.CMD_GETSTATUS, b''),
+    (ModemDefs.CMD_JOIN, b'\x00'),
+])
+def test_decode_badsize(cmd, data):
+    with pytest.raises(CommandError) as ex:
+        COMMANDS[cmd].decode(data)
+    assert ex.value.rc == ModemDefs.RC_BADSIZE
+
+
+class FakeSerial:
+    def __init__(self, **kwargs):
+        self.rts = 0
+        self.cts = True
+        self.timeout = kwargs.get('timeout')
+        self.written = []
+        self.response = b''
+        self.reads = []
+
+    def open(self):
+        pass
+
+    def write(self, pkt):
+        self.written.append(bytes(pkt))
+
+    def read(self, size=1):
+        self.reads.append(size)
+        data, self.response = self.response[:size], self.response[size:]
+        return data
+
+
+@pytest.fixture
+def m(monkeypatch):
+    monkeypatch.setattr(modem, 'Serial', FakeSerial)
+    monkeypatch.setattr(modem.time, 'sleep', lambda s: None)
+    return Modem('/dev/null', modem.Timing(timeouts={'status': 0.05}))
+
+
+EUI = bytes(range(8))
+KEY = bytes(range(16))
+
+# method, args, command, payload as built by hand before the table, response data, result
+METHODS = [
+    ('getversion', (), ModemDefs.CMD_GETVERSION, b'', pack('>IIH', 1, 2, 3), (1, 2, 3)),
+    ('getchipeui', (), ModemDefs.CMD_GETCHIPEUI, b'', EUI, EUI),
+    ('setdeveui', (EUI,), ModemDefs.CMD_SETDEVEUI, EUI, b'', None),
+    ('setjoineui', (EUI,), ModemDefs.CMD_SETJOINEUI, EUI, b'', None),
+    ('setnwkkey', (KEY,), ModemDefs.CMD_SETNWKKEY, KEY, b'', None),
+    ('listregions', (), ModemDefs.CMD_LISTREGIONS, b'', b'\x01\x03', (1, 3)),
+    ('gettxpowoff', (), ModemDefs.CMD_GETTXPOWEROFFSET, b'', b'\xfe', -2),
+    ('settxpowoff', (-3,), ModemDefs.CMD_SETTXPOWEROFFSET, pack('b', -3), b'', None),
+    ('setprofile', (3, KEY), ModemDefs.CMD_SETADRPROFILE, b'\x03' + KEY, b'', None),
+    ('setprofile', (1,), ModemDefs.CMD_SETADRPROFILE, b'\x01', b'', None),
+    ('getinterval', (), ModemDefs.CMD_GETDMINFOINTERVAL, b'', b'\x85', 5*60*60),
+    ('setinterval', (5, 'h'), ModemDefs.CMD_SETDMINFOINTERVAL, b'\x85', b'', None),
+    ('getdmfields', (), ModemDefs.CMD_GETDMINFOFIELDS, b'', b'\x00\x01', (0, 1)),
+    ('getevent', (), ModemDefs.CMD_GETEVENT, b'', b'', None),
+    ('getcharge', (), ModemDefs.CMD_GETCHARGE, b'', pack('>I', 42), 42),
+    ('setalarm', (60,), ModemDefs.CMD_SETALARMTIMER, pack('>I', 60), b'', None),
+    ('firmwareupdate', (1, 3, KEY*8), ModemDefs.CMD_FIRMWAREUPDATE, pack('>HH', 1, 3) + KEY*8, b'', None),
+    ('suspend', (True,), ModemDefs.CMD_SUSPENDMODEMCOMM, b'\x01', b'', None),
+    ('maxpayload', (), ModemDefs.CMD_GETNEXTTXMAXPAYLOAD, b'', b'\x33', 0x33),
+    ('requesttx', (2, b'hi', True), ModemDefs.CMD_REQUESTTX, b'\x02\x01hi', b'', None),
+    ('emergencytx', (2, b'hi'), ModemDefs.CMD_EMERGENCYTX, b'\x02\x00hi', b'', None),
+    ('tx', (2, b'hi', True), ModemDefs.CMD_EMERGENCYTX, b'\x02\x00hi', b'', None),
+    ('setmulticast', (7, KEY, KEY, 9), ModemDefs.CMD_SETMULTICAST, pack('>I', 7) + KEY + KEY + pack('>I', 9), b'', None),
+    ('uploadinit', (3, True, 100, 5), ModemDefs.CMD_UPLOADINIT, pack('>BBHH', 3, 1, 100, 5), b'', None),
+    ('uploadstart', (0xDEADBEEF,), ModemDefs.CMD_UPLOADSTART, pack('>I', 0xDEADBEEF), b'', None),
+    ('setappstatus', (EUI,), ModemDefs.CMD_SETAPPSTATUS, EUI, b'', None),
+    ('streaminit', (4, False), ModemDefs.CMD_STREAMINIT, b'\x04\x00', b'', None),
+    ('streamdata', (4, b'rec'), ModemDefs.CMD_SENDSTREAMDATA, b'\x04rec', b'', None),
+    ('streamstatus', (4,), ModemDefs.CMD_STREAMSTATUS, b'\x04', pack('>HH', 1, 2), (1, 2)),
+]
+
+
+@pytest.mark.parametrize('method, args, cmd, payload, data, result', METHODS, ids=[x[0] for x in METHODS])
+def test_methods(m, method, args, cmd, payload, data, result):
+    m.ser.response = reference_packet(ModemDefs.RC_OK, data)
+    assert getattr(m, method)(*args) == result
+    assert m.ser.written == [reference_packet(cmd, payload)]
+
+
+def test_error_response(m):
+    m.ser.response = reference_packet(ModemDefs.RC_BUSY)
+    with pytest.raises(CommandError) as ex:
+        m.join()
+    assert ex.value.rc == ModemDefs.RC_BUSY
+
+
+def test_read_packet(m):
+    m.ser.response = reference_packet(ModemDefs.RC_OK, bytes(200))
+    assert m.read_packet() == (ModemDefs.RC_OK, bytes(200))
+    assert m.ser.reads == [2, 201]
+    m.ser.response = reference_packet(ModemDefs.RC_OK, bytes(200))[:-1]
+    assert m.read_packet() is None
+    m.ser.response = b'\x00'
+    assert m.read_packet() is None
+
+
+def test_timeout_per_class(m):
+    m.ser.response = reference_packet(ModemDefs.RC_OK, b'\x01')
+    m.getstatus()
+    assert m.ser.timeout == 0.05
+    m.ser.response = reference_packet(ModemDefs.RC_OK)
+    m.setclass(0)
+    assert m.ser.timeout == 1
+
+
+def test_timing_load(tmp_path):
+    path = str(tmp_path / 'timing.json')
+    assert vars(modem.Timing.load('A1', path)) == vars(modem.Timing())
+    modem.Timing(timeout=0.5, timeouts={'status': 0.03}).save('A1', path)
+    timing = modem.Timing.load('A1', path)
+    assert timing.timeout == 0.5 and timing.timeout_for(ModemDefs.CMD_GETREGION) == 0.03
+    assert vars(modem.Timing.load('B2', path)) == vars(modem.Timing())
+    with open(path, 'w') as f:
+        f.write('{"A1": {"timeout": 0.5, "unknown": 1}}')
+    assert vars(modem.Timing.load('A1', path)) == vars(modem.Timing())
+    with open(path, 'w') as f:
+        f.write('{"A1": ')
+    assert vars(modem.Timing.load('A1', path)) == vars(modem.Timing())
@@ -0,0 +1,135 @@
+import pytest
+
+import personalization
+from personalization import Journal, Provisioner, load_manifest
+
+HEADER = 'deveui,appeui,appkey,chipeui\n'
+ROW = '0000000000000001,70B3D57ED0000000,000102030405060708090A0B0C0D0E0F,\n'
+
+
+def write(tmp_path, text, name='devices.csv'):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_csv_entries(tmp_path):
+    entries = load_manifest(write(tmp_path, HEADER + ROW + '00-00-00-00-00-00-00-02,70b3d57ed0000000,000102030405060708090a0b0c0d0e0f,0011223344556677\n'))
+    assert [e['deveui'] for e in entries] == ['0000000000000001', '0000000000000002']
+    assert entries[0]['chipeui'] == ''
+    assert entries[1]['chipeui'] == '0011223344556677'
+    assert entries[1]['joineui'] == '70B3D57ED0000000'
+
+
+def test_json_joineui(tmp_path):
+    entries = load_manifest(write(tmp_path, '[{"deveui": "0000000000000001", "joineui": "70B3D57ED0000000", '
+                                            '"appkey": "000102030405060708090A0B0C0D0E0F"}]', 'devices.json'))
+    assert entries[0]['joineui'] == '70B3D57ED0000000'
+
+
+def test_surplus_fields_ignored(tmp_path):
+    entries = load_manifest(write(tmp_path, HEADER + ROW.rstrip('\n') + ',extra,fields\n'))
+    assert len(entries) == 1
+
+
+def test_missing_column(tmp_path):
+    with pytest.raises(ValueError, match='entry 3: missing appkey'):
+        load_manifest(write(tmp_path, HEADER + ROW + '0000000000000002,70B3D57ED0000000,,\n'))
+
+
+def test_invalid_credentials(tmp_path):
+    with pytest.raises(ValueError, match='entry 2: invalid'):
+        load_manifest(write(tmp_path, HEADER + '0001,70B3D57ED0000000,00,\n'))
+
+
+@pytest.mark.parametrize('row', [
+    'ZZZZZZZZZZZZZZZZ,70B3D57ED0000000,000102030405060708090A0B0C0D0E0F,\n',
+    '0000000000000001,70B3D57ED0000000,000102030405060708090A0B0C0D0E0G,\n',
+    '0000000000000001,70B3D57ED0000000,000102030405060708090A0B0C0D0E0F,00112233\n',
+])
+def test_invalid_hex(tmp_path, row):
+    with pytest.raises(ValueError, match='entry 2: invalid'):
+        load_manifest(write(tmp_path, HEADER + row))
+
+
+def test_duplicate_deveui(tmp_path):
+    with pytest.raises(ValueError, match='entry 3: duplicate deveui'):
+        load_manifest(write(tmp_path, HEADER + ROW + ROW))
+
+
+def test_duplicate_chipeui(tmp_path):
+    rows = ROW.replace(',\n', ',0011223344556677\n') + ROW.replace('01,', '02,', 1).replace(',\n', ',0011223344556677\n')
+    with pytest.raises(ValueError, match='entry 3: duplicate chipeui'):
+        load_manifest(write(tmp_path, HEADER + rows))
+
+
+class FakeSerial:
+    def close(self):
+        pass
+
+
+class FakeModem:
+    def __init__(self, chipeui, verify=True):
+        self.chipeui = bytes.fromhex(chipeui)
+        self.verify = verify
+        self.deveui = self.joineui = self.nwkkey = None
+        self.ser = FakeSerial()
+
+    def setdeveui(self, eui):
+        self.deveui = eui if self.verify else bytes(8)
+
+    def setjoineui(self, eui):
+        self.joineui = eui
+
+    def setnwkkey(self, key):
+        self.nwkkey = key
+
+
+def entry(deveui, chipeui=''):
+    return { 'deveui': deveui, 'joineui': '70B3D57ED0000000', 'appkey': '000102030405060708090A0B0C0D0E0F', 'chipeui': chipeui }
+
+
+@pytest.fixture
+def modems(monkeypatch):
+    modems = {}
+    monkeypatch.setattr(personalization, 'Modem', lambda port: modems[port])
+    return modems
+
+
+def test_journal_resume(tmp_path):
+    path = str(tmp_path / 'devices.journal')
+    Journal(path).add('0011223344556677', '0000000000000001', 'A')
+    with open(path, 'a') as f:
+        f.write('{"chipeui": "8899AABBCCDDEEFF", "dev')
+    journal = Journal(path)
+    assert journal.chipeuis == {'0011223344556677'}
+    assert journal.deveuis == {'0000000000000001'}
+    journal.add('8899AABBCCDDEEFF', '0000000000000002', 'B')
+    assert Journal(path).deveuis == {'0000000000000001', '0000000000000002'}
+
+
+def test_provision_pinned_and_free(tmp_path, modems):
+    journal = Journal(str(tmp_path / 'devices.journal'))
+    prov = Provisioner([entry('0000000000000001'), entry('0000000000000002', '0011223344556677')], journal)
+    modems['A'] = FakeModem('8899AABBCCDDEEFF')
+    modems['B'] = FakeModem('0011223344556677')
+    assert prov.provision('A') == 'chipeui=8899AABBCCDDEEFF deveui=0000000000000001'
+    assert prov.provision('B') == 'chipeui=0011223344556677 deveui=0000000000000002'
+    assert modems['B'].nwkkey == bytes(range(16))
+    assert prov.provision('A') == 'already provisioned'
+    modems['C'] = FakeModem('1111111111111111')
+    assert prov.provision('C') == 'no manifest entry left'
+    # a re-run skips what the journal has
+    assert not Provisioner([entry('0000000000000001')], Journal(journal.path)).free
+
+
+def test_release_on_verification_failure(tmp_path, modems):
+    journal = Journal(str(tmp_path / 'devices.journal'))
+    prov = Provisioner([entry('0000000000000001'), entry('0000000000000002', '0011223344556677')], journal)
+    modems['A'] = FakeModem('8899AABBCCDDEEFF', verify=False)
+    modems['B'] = FakeModem('0011223344556677', verify=False)
+    results = prov.run(['A', 'B'])
+    assert all(r == 'FAILED: verification failed' for r in results.values())
+    assert [e['deveui'] for e in prov.free] == ['0000000000000001']
+    assert list(prov.pinned) == ['0011223344556677']
+    assert not journal.deveuis